@@ -0,0 +1,127 @@
+"""
+Cross-commodity backtesting for the Oil & Gas Market Optimization system.
+This module stacks the prices of several commodities into one matrix and runs a
+strategy over every column in a single vectorized pass, instead of one backtest
+call per commodity.
+"""
+
+import numpy as np
+import pandas as pd
+
+from data_pipeline import load_data
+from performance_metrics import PERFORMANCE_METRICS, batch_metrics
+from trading_strategies import STRATEGY_KERNELS, BacktestResult
+
+
+def price_matrix(commodities, loader=load_data):
+    """
+    Align the prices of several commodities on one date index.
+
+    Dates are the union of all commodities' dates. Within a commodity's own
+    date range, a date it has no price for carries its last price forward,
+    so that day counts as a zero return. Outside that range the price is NaN
+    and the strategy stays out of the market.
+
+    Parameters:
+    -----------
+    commodities : list
+        Commodities to load
+    loader : callable
+        Called as ``loader(commodity, columns=['Price'])``
+
+    Returns:
+    --------
+    pd.DataFrame
+        Prices with one column per commodity
+    """
+    prices = pd.concat(
+        {commodity: loader(commodity, columns=['Price'])['Price'] for commodity in commodities},
+        axis=1
+    ).sort_index()
+    return prices.ffill().where(prices.bfill().notna())
+
+
+def price_columns(commodities, loader=load_data):
+    """
+    Stack the prices of several commodities as the columns of one matrix.
+
+    Each column holds one commodity's prices on its own calendar: row t is
+    its t-th price, and shorter histories are padded with NaN at the end.
+    Rolling windows and returns therefore run over the same prices as in a
+    backtest of that commodity alone, however sparse its dates are.
+
+    Parameters:
+    -----------
+    commodities : list
+        Commodities to load
+    loader : callable
+        Called as ``loader(commodity, columns=['Price'])``
+
+    Returns:
+    --------
+    pd.DataFrame
+        Prices with one column per commodity, indexed by observation number
+    """
+    series = {commodity: loader(commodity, columns=['Price'])['Price'] for commodity in commodities}
+    n = max((len(prices) for prices in series.values()), default=0)
+    values = np.full((n, len(series)), np.nan)
+    for j, prices in enumerate(series.values()):
+        values[:len(prices), j] = prices.to_numpy(dtype=np.float64)
+    return pd.DataFrame(values, index=pd.RangeIndex(n, name='Observation'), columns=list(series))
+
+
+def backtest_matrix(prices, strategy, **params):
+    """
+    Backtest a strategy on every column of a price matrix at once.
+
+    Parameters:
+    -----------
+    prices : pd.DataFrame
+        Prices with one column per commodity, as from price_columns
+    strategy : str or callable
+        Name in STRATEGY_KERNELS or a kernel function
+    **params
+        Strategy parameters passed to the kernel
+
+    Returns:
+    --------
+    BacktestResult
+        Result with (dates, commodities) arrays
+    """
+    kernel = STRATEGY_KERNELS[strategy] if isinstance(strategy, str) else strategy
+    values = np.ascontiguousarray(prices.to_numpy(dtype=np.float64))
+    signal, indicators = kernel(values, **params)
+    return BacktestResult(prices.index, None, values, signal, indicators)
+
+
+def comparison_table(backtest, commodities):
+    """
+    Compute the performance metrics of every commodity of a matrix backtest.
+
+    For a backtest of price_columns, the metrics match ``performance_metrics``
+    of a single-commodity backtest over each commodity's own history. The
+    table also has the buy-and-hold total return for reference.
+
+    Returns:
+    --------
+    pd.DataFrame
+        One row per commodity and one column per metric
+    """
+    # Each commodity's history runs from its first to its last price
+    has_price = ~np.isnan(backtest.prices)
+    n_periods = len(has_price) - has_price.argmax(axis=0) - has_price[::-1].argmax(axis=0)
+
+    metrics = batch_metrics(backtest.strategy_returns.T, n_periods_total=n_periods)
+    table = pd.DataFrame(
+        {PERFORMANCE_METRICS[name]: values for name, values in metrics.items()},
+        index=pd.Index(commodities, name='Commodity')
+    )
+    table['Buy & Hold Return'] = batch_metrics(backtest.returns.T)['total_return']
+    return table
+
+
+def compare_commodities(commodities, strategy, loader=load_data, **params):
+    """Backtest a strategy on several commodities at once and return their comparison table."""
+    prices = price_columns(commodities, loader)
+    backtest = backtest_matrix(prices, strategy, **params)
+    return comparison_table(backtest, list(prices.columns))
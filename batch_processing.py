@@ -0,0 +1,83 @@
+"""
+Batch processing for the Oil & Gas Market Optimization system.
+This module runs per-commodity jobs on a process pool, one worker per commodity.
+
+Workers are started with the 'spawn' method so they never inherit the state of
+a multi-threaded parent such as the Streamlit server, and they only import the
+Streamlit-free pipeline modules.
+"""
+
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from data_pipeline import generate_sample_data, process_data
+
+
+def generate_and_process(commodity, compact=False):
+    """Generate, save and process sample data for one commodity."""
+    # Generate sample data
+    df_sample = generate_sample_data(commodity)
+
+    # Save to raw directory
+    os.makedirs('data/raw', exist_ok=True)
+    df_sample.to_csv(f'data/raw/{commodity}.csv')
+
+    # Process data
+    df_processed = process_data(df_sample, commodity, compact)
+
+    return {'rows': len(df_processed)}
+
+
+def run_batch(func, commodities, max_workers=None, progress=None, **kwargs):
+    """
+    Run a job for every commodity on a process pool.
+
+    A failing commodity is reported in the results and does not stop the others.
+
+    Parameters:
+    -----------
+    func : callable
+        Module-level function called as ``func(commodity, **kwargs)``
+    commodities : list
+        Commodities to process
+    max_workers : int, optional
+        Number of worker processes. Defaults to one per commodity, up to the
+        number of CPUs. With 1 the jobs run in the calling process.
+    progress : callable, optional
+        Called as ``progress(commodity, outcome, n_done, n_total)`` as each job finishes
+    **kwargs
+        Extra keyword arguments for ``func``
+
+    Returns:
+    --------
+    dict
+        Commodity to ``{'status': 'ok', 'result': ...}`` or
+        ``{'status': 'error', 'error': message}``, in the order given
+    """
+    if max_workers is None:
+        max_workers = min(len(commodities), os.cpu_count() or 1)
+    outcomes = {}
+
+    def record(commodity, outcome):
+        outcomes[commodity] = outcome
+        if progress is not None:
+            progress(commodity, outcome, len(outcomes), len(commodities))
+
+    if max_workers <= 1:
+        for commodity in commodities:
+            try:
+                record(commodity, {'status': 'ok', 'result': func(commodity, **kwargs)})
+            except Exception as e:
+                record(commodity, {'status': 'error', 'error': f"{type(e).__name__}: {e}"})
+    else:
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as executor:
+            futures = {executor.submit(func, commodity, **kwargs): commodity for commodity in commodities}
+            for future in as_completed(futures):
+                try:
+                    record(futures[future], {'status': 'ok', 'result': future.result()})
+                except Exception as e:
+                    record(futures[future], {'status': 'error', 'error': f"{type(e).__name__}: {e}"})
+
+    return {commodity: outcomes[commodity] for commodity in commodities}
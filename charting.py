@@ -0,0 +1,213 @@
+"""
+Charting helpers for the Oil & Gas Market Optimization system.
+This module decimates long series before they are plotted, so the cost of drawing
+a chart depends on its width in pixels rather than on the length of the history.
+
+Series are reduced with Largest-Triangle-Three-Buckets (LTTB): the series is split
+into as many buckets as there are points to keep, and from each bucket the point
+forming the largest triangle with its neighbours is kept. Peaks, troughs and
+crossings survive, unlike with plain striding.
+
+Rendered charts are kept as PNG images in a bounded cache, so a rerun with the same
+data and parameters does not draw the figure again.
+"""
+
+import io
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# About one point per pixel of a 10-inch figure at the default 100 dpi
+MAX_CHART_POINTS = 1000
+
+DEFAULT_FIGURE_CACHE_BYTES = 32 * 1024 * 1024
+
+# Same options as st.pyplot, so cached images look like directly drawn ones
+SAVEFIG_OPTIONS = {'format': 'png', 'dpi': 200, 'bbox_inches': 'tight'}
+
+def lttb_indices(x, y, n_out):
+    """
+    Select the positions of the points to keep with Largest-Triangle-Three-Buckets.
+
+    Parameters:
+    -----------
+    x : np.ndarray
+        Increasing x values, numeric
+    y : np.ndarray
+        y values without missing values
+    n_out : int
+        Number of points to keep, at least 3
+
+    Returns:
+    --------
+    np.ndarray
+        Sorted positions, always including the first and the last point
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    # Offsets keep the triangle areas well conditioned for nanosecond timestamps
+    x = np.asarray(x, dtype=np.float64) - float(x[0])
+    y = np.asarray(y, dtype=np.float64)
+
+    # The first and last points are buckets of their own
+    every = (n - 2) / (n_out - 2)
+    edges = np.floor(np.arange(n_out - 1) * every).astype(np.int64) + 1
+    edges = np.append(edges, n)
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+
+        # The third vertex is the average of the next bucket
+        next_start, next_end = edges[i + 1], edges[i + 2]
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+
+    return selected
+
+def downsample(series, max_points=MAX_CHART_POINTS, keep=None):
+    """
+    Reduce a Series to about ``max_points`` points for plotting.
+
+    Missing values are dropped first. Points flagged in ``keep`` are always
+    kept in addition to the LTTB selection, so that markers drawn on the line
+    still sit on it.
+
+    Parameters:
+    -----------
+    series : pd.Series
+        Series to plot, with a DatetimeIndex or numeric index
+    max_points : int
+        Number of points to keep
+    keep : array-like of bool, optional
+        Mask aligned with ``series`` of points that must be kept
+
+    Returns:
+    --------
+    pd.Series
+        The kept points, in their original order
+    """
+    valid = series.notna().to_numpy()
+    if keep is not None:
+        keep = np.asarray(keep, dtype=bool) & valid
+    positions = np.flatnonzero(valid)
+
+    if len(positions) <= max_points:
+        return series.iloc[positions]
+
+    index = series.index
+    if isinstance(index, pd.DatetimeIndex):
+        x = index.asi8[positions]
+    else:
+        x = np.asarray(index, dtype=np.float64)[positions]
+    y = series.to_numpy(dtype=np.float64)[positions]
+
+    chosen = positions[lttb_indices(x, y, max_points)]
+    if keep is not None:
+        chosen = np.union1d(chosen, np.flatnonzero(keep))
+    return series.iloc[chosen]
+
+def render_png(fig):
+    """Render a matplotlib figure to PNG bytes and close it, releasing its memory."""
+    import matplotlib.pyplot as plt
+
+    try:
+        buffer = io.BytesIO()
+        fig.savefig(buffer, **SAVEFIG_OPTIONS)
+        return buffer.getvalue()
+    finally:
+        plt.close(fig)
+
+def chart_key(content_hash, chart_type, strategy=None, params=None):
+    """Build a figure cache key from the dataset hash, strategy, parameters and chart type."""
+    return (content_hash, strategy, tuple(sorted((params or {}).items())), chart_type)
+
+class FigureCache:
+    """
+    Process-wide LRU cache of rendered charts as PNG bytes.
+
+    Figures are rendered once per key and closed right after rendering, so
+    neither the figure nor its data is kept alive by the cache. Total memory
+    is bounded by ``max_bytes``; the least recently used images are evicted
+    first.
+
+    Parameters:
+    -----------
+    max_bytes : int
+        Memory budget for all cached images
+    """
+
+    def __init__(self, max_bytes=DEFAULT_FIGURE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_render(self, key, draw):
+        """
+        Get a chart image from the cache, drawing it with ``draw()`` on a miss.
+
+        ``draw`` returns a matplotlib figure, which is rendered to PNG and closed.
+        A key built by ``chart_key`` from a dataset content hash never serves a
+        stale image, because changed data has a different hash.
+        """
+        with self._lock:
+            png = self._entries.get(key)
+            if png is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return png
+            self.misses += 1
+
+        png = render_png(draw())
+
+        with self._lock:
+            if key not in self._entries and len(png) <= self.max_bytes:
+                self._entries[key] = png
+                self._bytes += len(png)
+                while self._bytes > self.max_bytes:
+                    _, evicted = self._entries.popitem(last=False)
+                    self._bytes -= len(evicted)
+                    self.evictions += 1
+
+        return png
+
+    def clear(self):
+        """Drop every cached image."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Return hit/miss counters and memory usage."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+            }
+
+# Shared by every session served by this process
+figure_cache = FigureCache()
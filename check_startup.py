@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+"""
+Startup budget check for the Oil & Gas Market Optimization web application.
+This script imports web_app.py in a fresh interpreter and fails when the import
+gets slower than the budget, loads a module that only some pages need, or
+creates files or directories.
+
+Usage:
+    python check_startup.py [--budget 1.5] [--repeat 3]
+
+Run it before deploying, as cold starts matter when the app scales to zero.
+"""
+
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+
+# Modules that must only be imported by the pages that use them
+LAZY_MODULES = [
+    'matplotlib', 'scipy', 'pyarrow', 'qa_component',
+    'data_pipeline', 'data_storage', 'streaming_ingest', 'batch_processing', 'downloads',
+    'trading_strategies', 'batch_backtest', 'strategy_sweep', 'walk_forward',
+    'risk_analysis', 'portfolio_risk',
+]
+
+# Libraries every page needs. Lazy modules they import themselves, such as
+# pyarrow under pandas 3, cannot be deferred by the app and are not reported.
+REQUIRED_MODULES = ['numpy', 'pandas', 'streamlit']
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Run in a fresh interpreter so nothing is cached from this process
+IMPORT_SCRIPT = """
+import sys, time, json
+sys.path.insert(0, {app_dir!r})
+start = time.perf_counter()
+import web_app
+elapsed = time.perf_counter() - start
+print(json.dumps({{'seconds': elapsed, 'modules': sorted(sys.modules)}}))
+"""
+
+DEPENDENCIES_SCRIPT = """
+import sys, json
+{imports}
+print(json.dumps(sorted(sys.modules)))
+"""
+
+def required_modules():
+    """Return the top-level modules loaded by importing REQUIRED_MODULES in a new interpreter."""
+    result = subprocess.run(
+        [sys.executable, '-c', DEPENDENCIES_SCRIPT.format(imports='\n'.join(f'import {m}' for m in REQUIRED_MODULES))],
+        capture_output=True, text=True, check=True
+    )
+    return {name.split('.')[0] for name in json.loads(result.stdout.strip().splitlines()[-1])}
+
+def measure_import(work_dir):
+    """Import web_app in a new interpreter from work_dir and return the time taken and the modules loaded."""
+    result = subprocess.run(
+        [sys.executable, '-c', IMPORT_SCRIPT.format(app_dir=APP_DIR)],
+        cwd=work_dir, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def check_startup(budget, repeat=3):
+    """
+    Check the cold import of web_app against the budget.
+
+    Parameters:
+    -----------
+    budget : float
+        Maximum import time in seconds, compared with the fastest of the runs
+    repeat : int
+        Number of fresh imports, to smooth out noise from the machine
+
+    Returns:
+    --------
+    list
+        Problems found, empty if the check passes
+    """
+    problems = []
+    timings = []
+    preloaded = required_modules()
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as work_dir:
+            result = measure_import(work_dir)
+            created = os.listdir(work_dir)
+        timings.append(result['seconds'])
+
+        if created:
+            problems.append(f"Importing web_app created {', '.join(sorted(created))}")
+        loaded = {name.split('.')[0] for name in result['modules']}
+        for module in LAZY_MODULES:
+            if module in loaded and module not in preloaded:
+                problems.append(f"Importing web_app loaded {module}")
+
+    fastest = min(timings)
+    print(f"web_app import: {fastest:.2f}s (budget {budget:.2f}s)")
+    if fastest > budget:
+        problems.append(f"Import took {fastest:.2f}s, over the {budget:.2f}s budget")
+
+    # Every run reports the same module and file problems
+    return list(dict.fromkeys(problems))
+
+def main(argv=None):
+    """Run the check and return the exit status."""
+    parser = argparse.ArgumentParser(description="Check the cold import time of web_app.py.")
+    parser.add_argument('--budget', type=float, default=1.5, help="maximum import time in seconds")
+    parser.add_argument('--repeat', type=int, default=3, help="number of fresh imports to time")
+    args = parser.parse_args(argv)
+
+    problems = check_startup(args.budget, args.repeat)
+    for problem in problems:
+        print(problem, file=sys.stderr)
+    return 1 if problems else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
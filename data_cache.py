@@ -0,0 +1,117 @@
+"""
+In-process cache for the Oil & Gas Market Optimization system.
+This module keeps recently loaded DataFrames in memory across Streamlit reruns
+and sessions, so moving a slider does not re-read every commodity from disk.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def _file_signature(path):
+    """Return (mtime_ns, size) for a file, or None if it does not exist."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+class DataFrameCache:
+    """
+    Process-wide LRU cache of DataFrames read from files.
+
+    Entries are keyed by file path and column projection and are only served
+    while the file's mtime and size are unchanged, so a rewritten file is never
+    returned stale. Total memory is bounded by ``max_bytes``; the least recently
+    used entries are evicted first.
+
+    Parameters:
+    -----------
+    max_bytes : int
+        Memory budget for all cached DataFrames
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes_saved = 0
+
+    def get_or_load(self, path, loader, columns=None, files=None):
+        """
+        Get a DataFrame from the cache, loading it with ``loader()`` on a miss.
+
+        ``files`` lists every file the DataFrame is read from when there is
+        more than ``path``; the entry is only served while none of them changed.
+        A shallow copy is returned so callers can add columns without
+        modifying the cached frame.
+        """
+        key = (path, tuple(columns) if columns is not None else None)
+        signatures = tuple(_file_signature(f) for f in (files or [path]))
+        signature = signatures if all(signatures) else None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == signature:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                self.bytes_saved += sum(size for _, size in signature) if signature else 0
+                return entry[1].copy(deep=False)
+            self.misses += 1
+
+        df = loader()
+        nbytes = int(df.memory_usage(deep=True).sum())
+
+        with self._lock:
+            self._discard(key)
+            if signature is not None and nbytes <= self.max_bytes:
+                self._entries[key] = (signature, df, nbytes)
+                self._bytes += nbytes
+                self._evict()
+
+        return df.copy(deep=False)
+
+    def invalidate(self, path=None):
+        """Drop every entry for a path, or the whole cache if no path is given."""
+        with self._lock:
+            for key in list(self._entries):
+                if path is None or key[0] == path:
+                    self._discard(key)
+
+    def stats(self):
+        """Return hit/miss counters and memory usage."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'disk_bytes_saved': self.bytes_saved,
+            }
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+
+    def _evict(self):
+        while self._bytes > self.max_bytes and self._entries:
+            _, (_, _, nbytes) = self._entries.popitem(last=False)
+            self._bytes -= nbytes
+            self.evictions += 1
+
+
+# Shared by every session served by this process
+dataframe_cache = DataFrameCache()
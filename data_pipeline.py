@@ -0,0 +1,311 @@
+"""
+Data pipeline for the Oil & Gas Market Optimization system.
+This module generates, cleans and enriches commodity price data without depending on Streamlit.
+"""
+
+import zlib
+
+import pandas as pd
+import numpy as np
+
+from data_storage import (
+    append_processed, read_feature_state, read_processed, save_feature_state, save_processed
+)
+
+# Columns added by add_features
+FEATURE_COLUMNS = [
+    'Returns', 'MA_10', 'MA_30', 'MA_50', 'Volatility', 'RSI',
+    'BB_Middle', 'BB_Upper', 'BB_Lower',
+    'EMA_12', 'EMA_26', 'MACD', 'MACD_Signal', 'MACD_Histogram'
+]
+
+# Longest rolling window used by add_features
+FEATURE_LOOKBACK = 50
+
+# Spans of the exponentially weighted features, carried as state between appends
+EMA_SPANS = {'EMA_12': 12, 'EMA_26': 26, 'MACD_Signal': 9}
+
+def compact_dtypes(df, int8_columns=()):
+    """Downcast float64 columns to float32 and the given -1/0/1 columns to int8, in place."""
+    floats = [col for col in df.select_dtypes(include=['float64']).columns if col not in int8_columns]
+    if floats:
+        df[floats] = df[floats].astype(np.float32)
+    for col in int8_columns:
+        df[col] = df[col].fillna(0).astype(np.int8)
+    return df
+
+class MemoryReport:
+    """Memory footprint of the data at each pipeline stage."""
+    
+    def __init__(self):
+        self.stages = {}
+    
+    def record(self, stage, df):
+        """Record the deep memory usage of a DataFrame for a stage."""
+        self.stages[stage] = int(df.memory_usage(deep=True).sum())
+    
+    def to_frame(self):
+        """Return the report as a DataFrame with one row per stage."""
+        return pd.DataFrame({
+            'Stage': list(self.stages),
+            'Memory (MB)': [nbytes / 1e6 for nbytes in self.stages.values()]
+        }).set_index('Stage')
+
+def generate_sample_data(commodity, start_date='2020-01-01', end_date='2023-01-01', freq='D'):
+    """Generate sample price data for a commodity."""
+    # Create date range
+    date_rng = pd.date_range(start=start_date, end=end_date, freq=freq)
+    
+    # Set random seed for reproducibility; str hashes are salted per process, so use a stable digest
+    np.random.seed(42 + zlib.crc32(commodity.encode('utf-8')) % 100)
+    
+    # Generate random walk
+    n = len(date_rng)
+    returns = np.random.normal(0.0005, 0.01, n)
+    
+    # Add some seasonality
+    seasonality = 0.1 * np.sin(np.linspace(0, 4*np.pi, n))
+    
+    # Add trend
+    trend = np.linspace(0, 0.5, n)
+    
+    # Combine components
+    log_prices = np.cumsum(returns) + seasonality + trend
+    
+    # Convert to prices
+    base_price = 50.0 if 'crude' in commodity else 2.0
+    prices = base_price * np.exp(log_prices)
+    
+    # Create DataFrame
+    df = pd.DataFrame({
+        'Date': date_rng,
+        'Price': prices
+    })
+    
+    # Set Date as index
+    df.set_index('Date', inplace=True)
+    
+    # Add volume
+    volume = np.random.lognormal(10, 1, n) * 1000
+    df['Volume'] = volume
+    
+    return df
+
+def iqr_bounds(df):
+    """Calculate the IQR outlier bounds for every numeric column."""
+    bounds = {}
+    for col in df.select_dtypes(include=['number']).columns:
+        Q1 = df[col].quantile(0.25)
+        Q3 = df[col].quantile(0.75)
+        IQR = Q3 - Q1
+        
+        bounds[col] = (Q1 - 1.5 * IQR, Q3 + 1.5 * IQR)
+    
+    return bounds
+
+def clean_data(df, bounds=None, compact=False):
+    """Clean data by handling missing values and outliers, optionally with fixed outlier bounds."""
+    # Make a copy of the data
+    df_cleaned = df.copy()
+    
+    # Handle missing values
+    df_cleaned = df_cleaned.ffill().bfill()
+    
+    # Handle outliers using IQR method
+    if bounds is None:
+        bounds = iqr_bounds(df_cleaned)
+    
+    for col, (lower_bound, upper_bound) in bounds.items():
+        # Replace outliers with bounds
+        df_cleaned.loc[df_cleaned[col] < lower_bound, col] = lower_bound
+        df_cleaned.loc[df_cleaned[col] > upper_bound, col] = upper_bound
+    
+    # Use float32 in compact mode
+    if compact:
+        compact_dtypes(df_cleaned)
+    
+    return df_cleaned
+
+def add_features(df, compact=False):
+    """Add technical indicators and features to the data."""
+    # Make a copy of the data
+    df_features = df.copy()
+    
+    # Calculate returns
+    df_features['Returns'] = df_features['Price'].pct_change()
+    
+    # Calculate moving averages
+    df_features['MA_10'] = df_features['Price'].rolling(window=10).mean()
+    df_features['MA_30'] = df_features['Price'].rolling(window=30).mean()
+    df_features['MA_50'] = df_features['Price'].rolling(window=50).mean()
+    
+    # Calculate volatility
+    df_features['Volatility'] = df_features['Returns'].rolling(window=20).std() * np.sqrt(252)
+    
+    # Calculate RSI
+    delta = df_features['Price'].diff()
+    gain = delta.copy()
+    loss = delta.copy()
+    gain[gain < 0] = 0
+    loss[loss > 0] = 0
+    loss = abs(loss)
+    
+    avg_gain = gain.rolling(window=14).mean()
+    avg_loss = loss.rolling(window=14).mean()
+    
+    rs = avg_gain / avg_loss
+    df_features['RSI'] = 100 - (100 / (1 + rs))
+    
+    # Calculate Bollinger Bands
+    df_features['BB_Middle'] = df_features['Price'].rolling(window=20).mean()
+    df_features['BB_Upper'] = df_features['BB_Middle'] + 2 * df_features['Price'].rolling(window=20).std()
+    df_features['BB_Lower'] = df_features['BB_Middle'] - 2 * df_features['Price'].rolling(window=20).std()
+    
+    # Calculate MACD
+    df_features['EMA_12'] = df_features['Price'].ewm(span=12, adjust=False).mean()
+    df_features['EMA_26'] = df_features['Price'].ewm(span=26, adjust=False).mean()
+    df_features['MACD'] = df_features['EMA_12'] - df_features['EMA_26']
+    df_features['MACD_Signal'] = df_features['MACD'].ewm(span=9, adjust=False).mean()
+    df_features['MACD_Histogram'] = df_features['MACD'] - df_features['MACD_Signal']
+    
+    # Use float32 in compact mode
+    if compact:
+        compact_dtypes(df_features)
+    
+    return df_features
+
+def feature_state(df_cleaned, df_features, bounds):
+    """Capture what append_data needs to continue the features after the last row."""
+    tail = df_cleaned.iloc[-FEATURE_LOOKBACK:]
+    
+    return {
+        'index_name': tail.index.name,
+        'index': [ts.isoformat() for ts in tail.index],
+        'tail': {col: tail[col].tolist() for col in tail.columns},
+        'ema': {col: float(df_features[col].iloc[-1]) for col in EMA_SPANS},
+        'bounds': {col: [float(lower), float(upper)] for col, (lower, upper) in bounds.items()}
+    }
+
+def _state_tail(state):
+    """Rebuild the cleaned tail rows stored in a feature state."""
+    index = pd.DatetimeIndex(pd.to_datetime(state['index']), name=state['index_name'])
+    return pd.DataFrame(state['tail'], index=index)
+
+def _continue_ewm(values, last, span):
+    """Continue an adjust=False EWM from its last value, as if computed over the full history."""
+    seeded = pd.concat([pd.Series([last]), pd.Series(values.to_numpy())], ignore_index=True)
+    return seeded.ewm(span=span, adjust=False).mean().iloc[1:].to_numpy()
+
+def continue_processing(df_new, state, compact=False):
+    """
+    Clean and add features to rows that follow the rows captured in a feature state.
+    
+    Parameters:
+    -----------
+    df_new : pd.DataFrame
+        New rows with a Date index. Rows at or before the state's last date are dropped.
+    state : dict
+        Feature state from feature_state
+    compact : bool
+        Return float32 columns
+        
+    Returns:
+    --------
+    tuple
+        (processed new rows, feature state after the new rows)
+    """
+    # Keep only rows after the last processed date
+    tail = _state_tail(state)
+    df_new = df_new[df_new.index > tail.index[-1]].reindex(columns=tail.columns)
+    if df_new.empty:
+        return df_new, state
+    
+    # Clean new rows, filling gaps from the last known values
+    bounds = {col: tuple(bound) for col, bound in state['bounds'].items()}
+    df_cleaned = clean_data(pd.concat([tail, df_new]), bounds, compact)
+    
+    # Recompute the rolling features over the tail and the new rows only
+    df_features = add_features(df_cleaned, compact).iloc[len(tail):].copy()
+    
+    # Continue the EMA-based features from their saved state
+    df_features['EMA_12'] = _continue_ewm(df_features['Price'], state['ema']['EMA_12'], EMA_SPANS['EMA_12'])
+    df_features['EMA_26'] = _continue_ewm(df_features['Price'], state['ema']['EMA_26'], EMA_SPANS['EMA_26'])
+    df_features['MACD'] = df_features['EMA_12'] - df_features['EMA_26']
+    df_features['MACD_Signal'] = _continue_ewm(df_features['MACD'], state['ema']['MACD_Signal'], EMA_SPANS['MACD_Signal'])
+    df_features['MACD_Histogram'] = df_features['MACD'] - df_features['MACD_Signal']
+    
+    if compact:
+        compact_dtypes(df_features)
+    
+    return df_features, feature_state(df_cleaned, df_features, bounds)
+
+def process_data(df, commodity, compact=False, report=None):
+    """Process data for a commodity, optionally in float32 and recording a MemoryReport."""
+    if report is not None:
+        report.record('Raw data', df)
+    
+    # Clean data
+    df_cleaned = clean_data(df, compact=compact)
+    if report is not None:
+        report.record('Cleaned data', df_cleaned)
+    
+    # Add features
+    df_features = add_features(df_cleaned, compact)
+    if report is not None:
+        report.record('Features', df_features)
+    
+    # Save to processed directory
+    save_processed(df_features, commodity)
+    
+    # Save the state for incremental updates (clipping leaves the quartiles unchanged)
+    save_feature_state(feature_state(df_cleaned, df_features, iqr_bounds(df_cleaned)), commodity)
+    
+    return df_features
+
+def append_data(df_new, commodity, compact=False):
+    """
+    Append new rows to a commodity's processed data without recomputing its history.
+    
+    Only the rolling-window tail and the EMA state of the last run are used, so the
+    cost grows with the number of new rows. The features of the new rows match a full
+    recompute of add_features. Outliers in the new rows are clipped to the bounds of
+    the last full processing run.
+    
+    Parameters:
+    -----------
+    df_new : pd.DataFrame
+        New rows with a Date index and the same columns as the original data
+    commodity : str
+        Name of the commodity
+    compact : bool
+        Process the new rows in float32
+        
+    Returns:
+    --------
+    pd.DataFrame
+        Processed rows that were appended
+    """
+    state = read_feature_state(commodity)
+    if state is None:
+        # Processed before feature states were saved
+        df_features = load_data(commodity)
+        if df_features.empty:
+            return process_data(df_new, commodity, compact)
+        
+        df_cleaned = df_features[[col for col in df_features.columns if col not in FEATURE_COLUMNS]]
+        state = feature_state(df_cleaned, df_features, iqr_bounds(df_cleaned))
+    
+    # Process only the new rows
+    df_features, state = continue_processing(df_new, state, compact)
+    if df_features.empty:
+        return df_features
+    
+    # Save the appended rows and the new state
+    append_processed(df_features, commodity)
+    save_feature_state(state, commodity)
+    
+    return df_features
+
+def load_data(commodity, columns=None):
+    """Load processed data for a commodity, optionally only the given columns."""
+    return read_processed(commodity, columns=columns)
@@ -0,0 +1,727 @@
+"""
+Storage layer for the Oil & Gas Market Optimization system.
+This module provides pluggable on-disk formats for processed commodity data.
+
+Columnar formats (Arrow IPC and Parquet) are used for the processed data so that
+reads can be memory-mapped and restricted to the columns a page actually needs.
+CSV is kept as an import/export format and as a fallback when pyarrow is not
+installed.
+"""
+
+import os
+import glob
+import importlib.util
+import json
+import shutil
+import hashlib
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from data_cache import dataframe_cache
+
+# pyarrow is slow to import, so it is only imported once a columnar file is read or written
+PYARROW_AVAILABLE = importlib.util.find_spec('pyarrow') is not None
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+PROCESSED_DIR = 'data/processed'
+MANIFEST_FILE = 'manifest.json'
+
+# Appended segments are merged into the processed file once there are this many
+MAX_SEGMENTS = 32
+
+# Multiplier of the polynomial that combines row hashes (the 64-bit FNV prime)
+_HASH_BASE = 0x100000001B3
+_HASH_MASK = (1 << 64) - 1
+
+_manifest_lock = threading.Lock()
+
+
+def pyarrow_modules():
+    """Import pyarrow on first use and return (pyarrow, pyarrow.feather, pyarrow.parquet)."""
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+    return pa, feather, pq
+
+
+def _index_columns(schema):
+    """Return the names of the columns pandas stored the index in."""
+    metadata = schema.pandas_metadata or {}
+    return [col for col in metadata.get('index_columns', []) if isinstance(col, str)]
+
+
+def _project(schema, columns):
+    """Add the stored index columns to a column projection."""
+    if columns is None:
+        return None
+    index_cols = [col for col in _index_columns(schema) if col not in columns]
+    return index_cols + list(columns)
+
+
+def _replace_atomically(path, write):
+    """Write a file through a temporary path so readers never see a partial file."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f'{path}.tmp-{os.getpid()}'
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+class _CsvChunkWriter:
+    """Append DataFrame chunks to a CSV file."""
+
+    def __init__(self, path):
+        self._file = open(path, 'w', newline='')
+        self._header = True
+
+    def write(self, df):
+        df.to_csv(self._file, header=self._header)
+        self._header = False
+
+    def close(self):
+        self._file.close()
+
+
+class _ArrowChunkWriter:
+    """Append DataFrame chunks to an Arrow IPC or Parquet file as separate batches."""
+
+    def __init__(self, path, make_writer):
+        self._pa = pyarrow_modules()[0]
+        self._sink = self._pa.OSFile(path, 'wb')
+        self._make_writer = make_writer
+        self._writer = None
+        self._schema = None
+
+    def write(self, df):
+        if self._writer is None:
+            table = self._pa.Table.from_pandas(df, preserve_index=True)
+            self._schema = table.schema
+            self._writer = self._make_writer(self._sink, self._schema)
+        else:
+            table = self._pa.Table.from_pandas(df, schema=self._schema, preserve_index=True)
+        self._writer.write_table(table)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        self._sink.close()
+
+
+class CsvStorage:
+    """Plain CSV files, one per commodity."""
+
+    name = 'csv'
+    extension = '.csv'
+
+    def write(self, df, path):
+        _replace_atomically(path, lambda tmp: df.to_csv(tmp))
+
+    def read(self, path, columns=None):
+        if columns is None:
+            return pd.read_csv(path, index_col=0, parse_dates=True)
+        # The index is always the first column of the file
+        index_col = pd.read_csv(path, nrows=0).columns[0]
+        usecols = [index_col] + [col for col in columns if col != index_col]
+        return pd.read_csv(path, index_col=0, parse_dates=True, usecols=usecols)
+
+    def open_writer(self, path):
+        return _CsvChunkWriter(path)
+
+
+class ArrowStorage:
+    """Uncompressed Arrow IPC (Feather v2) files, read through a memory map."""
+
+    name = 'arrow'
+    extension = '.arrow'
+
+    def write(self, df, path):
+        feather = pyarrow_modules()[1]
+        _replace_atomically(
+            path,
+            lambda tmp: feather.write_feather(df, tmp, compression='uncompressed')
+        )
+
+    def read(self, path, columns=None):
+        pa, feather, _ = pyarrow_modules()
+        with pa.memory_map(path, 'r') as source:
+            schema = pa.ipc.open_file(source).schema
+        table = feather.read_table(path, columns=_project(schema, columns), memory_map=True)
+        return table.to_pandas()
+
+    def open_writer(self, path):
+        pa = pyarrow_modules()[0]
+        return _ArrowChunkWriter(path, lambda sink, schema: pa.ipc.new_file(sink, schema))
+
+
+class ParquetStorage:
+    """Compressed Parquet files, the most compact option for archiving."""
+
+    name = 'parquet'
+    extension = '.parquet'
+
+    def write(self, df, path):
+        _replace_atomically(path, lambda tmp: df.to_parquet(tmp, engine='pyarrow'))
+
+    def read(self, path, columns=None):
+        pq = pyarrow_modules()[2]
+        schema = pq.read_schema(path)
+        table = pq.read_table(path, columns=_project(schema, columns), memory_map=True)
+        return table.to_pandas()
+
+    def open_writer(self, path):
+        pq = pyarrow_modules()[2]
+        return _ArrowChunkWriter(path, lambda sink, schema: pq.ParquetWriter(sink, schema))
+
+
+STORAGE_BACKENDS = {
+    'csv': CsvStorage,
+    'arrow': ArrowStorage,
+    'parquet': ParquetStorage,
+}
+
+DEFAULT_FORMAT = 'arrow' if PYARROW_AVAILABLE else 'csv'
+
+
+def get_storage(fmt=None):
+    """
+    Get a storage backend by name.
+
+    Parameters:
+    -----------
+    fmt : str, optional
+        One of 'arrow', 'parquet' or 'csv'. Defaults to DEFAULT_FORMAT.
+
+    Returns:
+    --------
+    object
+        Storage backend with ``read(path, columns=None)`` and ``write(df, path)``
+    """
+    fmt = fmt or DEFAULT_FORMAT
+    if fmt not in STORAGE_BACKENDS:
+        raise ValueError(f"Unknown storage format: {fmt}")
+    if fmt != 'csv' and not PYARROW_AVAILABLE:
+        raise ImportError(f"pyarrow is required for the '{fmt}' storage format")
+    return STORAGE_BACKENDS[fmt]()
+
+
+def processed_path(commodity, fmt=None, directory=PROCESSED_DIR):
+    """Get the path of the processed file for a commodity."""
+    return os.path.join(directory, f'{commodity}{get_storage(fmt).extension}')
+
+
+def find_processed_file(commodity, directory=PROCESSED_DIR):
+    """
+    Find the processed file for a commodity.
+
+    Saving keeps one processed file per commodity. When a legacy CSV file was
+    kept next to its columnar copy, the default format is preferred, then the
+    other columnar formats, then CSV.
+
+    Returns:
+    --------
+    tuple
+        (path, storage) or (None, None) if no file exists
+    """
+    for fmt in dict.fromkeys([DEFAULT_FORMAT, 'arrow', 'parquet', 'csv']):
+        if fmt != 'csv' and not PYARROW_AVAILABLE:
+            continue
+        path = processed_path(commodity, fmt, directory)
+        if os.path.exists(path):
+            return path, get_storage(fmt)
+    return None, None
+
+
+def _segment_dir(path):
+    return f'{path}.segments'
+
+
+def segment_files(path):
+    """Return the files of the rows appended to a processed file, oldest first."""
+    extension = os.path.splitext(path)[1]
+    return sorted(glob.glob(os.path.join(_segment_dir(path), f'*{extension}')))
+
+
+def _read_segments(storage, path, columns=None):
+    """Read a processed file followed by its appended segments."""
+    frames = [storage.read(file, columns=columns) for file in [path] + segment_files(path)]
+    return frames[0] if len(frames) == 1 else pd.concat(frames)
+
+
+def _remove_previous_files(commodity, path, directory, keep=()):
+    """
+    Remove what a newly written processed file at ``path`` replaces.
+
+    These are the segments appended to the previous file and the commodity's
+    files in other formats, which would otherwise be read instead.
+    """
+    for backend in STORAGE_BACKENDS.values():
+        other = os.path.join(directory, f'{commodity}{backend.extension}')
+        if other in keep:
+            continue
+        shutil.rmtree(_segment_dir(other), ignore_errors=True)
+        if other != path and os.path.exists(other):
+            os.remove(other)
+        dataframe_cache.invalidate(other)
+
+
+def _store(df, commodity, fmt, directory, keep=()):
+    storage = get_storage(fmt)
+    path = processed_path(commodity, storage.name, directory)
+    storage.write(df, path)
+    _remove_previous_files(commodity, path, directory, keep)
+    update_manifest(commodity, df, path, directory)
+    return path
+
+
+def save_processed(df, commodity, fmt=None, directory=PROCESSED_DIR):
+    """
+    Save processed data for a commodity and return the file path.
+
+    The commodity's files in other formats are removed, so later reads return
+    exactly this data.
+    """
+    return _store(df, commodity, fmt, directory)
+
+
+def append_processed(df, commodity, directory=PROCESSED_DIR):
+    """
+    Append rows to a commodity's processed data, keeping its current format.
+
+    The rows are written as a new segment file next to the processed file,
+    and the manifest entry and its content hash are continued from their
+    stored state, so an append costs time in the number of new rows rather
+    than the length of the history. Every MAX_SEGMENTS appends the segments
+    are merged back into the processed file.
+
+    Returns:
+    --------
+    str
+        Path of the processed file
+    """
+    path, storage = find_processed_file(commodity, directory)
+    if path is None:
+        return save_processed(df, commodity, directory=directory)
+
+    segments = segment_files(path)
+    with _manifest_locked(directory):
+        manifest = read_manifest(directory)
+        entry = manifest.get(commodity)
+        appendable = (
+            entry is not None
+            and entry['file'] == os.path.basename(path)
+            and 'hash_state' in entry
+            and entry['columns'] == [str(col) for col in df.columns]
+            and len(segments) < MAX_SEGMENTS
+        )
+        if appendable:
+            number = int(os.path.basename(segments[-1]).split('.')[0]) + 1 if segments else 1
+            os.makedirs(_segment_dir(path), exist_ok=True)
+            storage.write(df, os.path.join(_segment_dir(path), f'{number:06d}{storage.extension}'))
+            dataframe_cache.invalidate(path)
+
+            hasher = ContentHasher(entry['columns'], entry['hash_state'])
+            hasher.update(df)
+            start = pd.Timestamp(entry['start_date']) if entry['start_date'] else None
+            end = pd.Timestamp(entry['end_date']) if entry['end_date'] else None
+            if len(df) > 0 and isinstance(df.index, pd.DatetimeIndex):
+                start = df.index.min() if start is None else min(start, df.index.min())
+                end = df.index.max() if end is None else max(end, df.index.max())
+            manifest[commodity] = _manifest_record(path, start, end, hasher)
+            _write_manifest(manifest, directory)
+            return path
+
+    # No incremental state to continue from, or too many segments: rewrite once
+    existing = _read_segments(storage, path)
+    return save_processed(pd.concat([existing, df]), commodity, storage.name, directory)
+
+
+def _state_path(commodity, directory):
+    return os.path.join(directory, f'{commodity}.state.json')
+
+
+def save_feature_state(state, commodity, directory=PROCESSED_DIR):
+    """
+    Save the incremental feature state for a commodity next to its processed data.
+
+    The state is stamped with the content hash of the processed data it
+    continues, so call this after saving or appending that data.
+    """
+    entry = read_manifest(directory).get(commodity) or {}
+    state = dict(state, content_hash=entry.get('content_hash'))
+
+    def write(tmp):
+        with open(tmp, 'w') as f:
+            json.dump(state, f, default=str)
+
+    _replace_atomically(_state_path(commodity, directory), write)
+
+
+def read_feature_state(commodity, directory=PROCESSED_DIR):
+    """
+    Read the incremental feature state for a commodity.
+
+    Returns:
+    --------
+    dict or None
+        The state, or None if there is none or the processed data was
+        rewritten since it was saved, e.g. by import_csv
+    """
+    try:
+        with open(_state_path(commodity, directory)) as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    entry = read_manifest(directory).get(commodity)
+    if entry is None or state.get('content_hash') != entry['content_hash']:
+        return None
+    return state
+
+
+class ContentHasher:
+    """
+    Incremental content hash of a DataFrame.
+
+    Rows are hashed independently and the row hashes are combined as a
+    polynomial modulo 2**64, so feeding a DataFrame in row chunks gives the
+    same digest as feeding it whole. The running state is two integers that
+    the manifest stores, so an append continues the hash without reading
+    the rows hashed before.
+
+    Parameters:
+    -----------
+    columns : list
+        Column names, which are part of the hash
+    state : dict, optional
+        ``state()`` of the hasher to continue
+    """
+
+    def __init__(self, columns, state=None):
+        self.columns = [str(col) for col in columns]
+        self.rows = state['rows'] if state else 0
+        self._value = state['value'] if state else 0
+
+    def update(self, df):
+        # NaNs from different computations can carry different bit patterns
+        floats = df.select_dtypes(include=['floating']).columns
+        if len(floats) > 0:
+            df = df.copy(deep=False)
+            df[floats] = df[floats].where(df[floats].notna())
+        row_hashes = pd.util.hash_pandas_object(df, index=True).to_numpy(dtype=np.uint64)
+        m = len(row_hashes)
+        if m == 0:
+            return
+
+        # value * base**m + sum of hash_j * base**(m-1-j); uint64 products wrap modulo 2**64
+        powers = np.cumprod(np.full(m, _HASH_BASE, dtype=np.uint64))
+        weights = np.concatenate((np.ones(1, dtype=np.uint64), powers[:-1]))[::-1]
+        block = int((row_hashes * weights).sum(dtype=np.uint64))
+        self._value = (self._value * int(powers[-1]) + block) & _HASH_MASK
+        self.rows += m
+
+    def state(self):
+        return {'rows': self.rows, 'value': self._value}
+
+    def hexdigest(self):
+        return hashlib.sha256(json.dumps([self.columns, self.rows, self._value]).encode()).hexdigest()
+
+
+def content_hash(df):
+    """Compute a stable hash of a DataFrame's index, columns and values."""
+    hasher = ContentHasher(df.columns)
+    hasher.update(df)
+    return hasher.hexdigest()
+
+
+def _manifest_path(directory):
+    return os.path.join(directory, MANIFEST_FILE)
+
+
+def read_manifest(directory=PROCESSED_DIR):
+    """
+    Read the manifest of processed datasets.
+
+    Returns:
+    --------
+    dict
+        Mapping of commodity name to its manifest entry, empty if there is no manifest
+    """
+    try:
+        with open(_manifest_path(directory)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_manifest(manifest, directory):
+    def write(tmp):
+        with open(tmp, 'w') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+
+    _replace_atomically(_manifest_path(directory), write)
+
+
+def _manifest_record(path, start, end, hasher):
+    return {
+        'file': os.path.basename(path),
+        'rows': int(hasher.rows),
+        'start_date': start.strftime('%Y-%m-%d') if start is not None else None,
+        'end_date': end.strftime('%Y-%m-%d') if end is not None else None,
+        'columns': hasher.columns,
+        'content_hash': hasher.hexdigest(),
+        'hash_state': hasher.state(),
+        'updated': datetime.now().isoformat(timespec='seconds'),
+    }
+
+
+def manifest_entry(df, path):
+    """Describe a processed dataset for the manifest."""
+    has_dates = len(df) > 0 and isinstance(df.index, pd.DatetimeIndex)
+    hasher = ContentHasher(df.columns)
+    hasher.update(df)
+    return _manifest_record(
+        path,
+        df.index.min() if has_dates else None,
+        df.index.max() if has_dates else None,
+        hasher
+    )
+
+
+@contextmanager
+def _manifest_locked(directory):
+    """Serialize manifest updates across threads and, where supported, processes."""
+    with _manifest_lock:
+        if fcntl is None:
+            yield
+            return
+
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, '.manifest.lock'), 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def update_manifest(commodity, df, path, directory=PROCESSED_DIR, entry=None):
+    """Record a processed dataset in the manifest, describing ``df`` unless an entry is given."""
+    if entry is None:
+        entry = manifest_entry(df, path)
+
+    with _manifest_locked(directory):
+        manifest = read_manifest(directory)
+        manifest[commodity] = entry
+        _write_manifest(manifest, directory)
+    return entry
+
+
+class ProcessedWriter:
+    """
+    Write processed data for a commodity chunk by chunk.
+
+    Chunks go to a temporary file that replaces the processed file when the
+    writer is closed without error, so readers never see a partial dataset.
+    The manifest entry is built as the chunks are written.
+
+    Usage:
+    ------
+    with ProcessedWriter('crude_oil') as writer:
+        for chunk in chunks:
+            writer.write(chunk)
+    """
+
+    def __init__(self, commodity, fmt=None, directory=PROCESSED_DIR):
+        self.commodity = commodity
+        self.directory = directory
+        self.storage = get_storage(fmt)
+        self.path = processed_path(commodity, self.storage.name, directory)
+        self.rows = 0
+        self._tmp_path = f'{self.path}.tmp-{os.getpid()}'
+        self._writer = None
+        self._hasher = None
+        self._start = None
+        self._end = None
+
+    def write(self, df):
+        if self._writer is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._writer = self.storage.open_writer(self._tmp_path)
+            self._hasher = ContentHasher(df.columns)
+
+        self._writer.write(df)
+        self._hasher.update(df)
+        self.rows += len(df)
+        if len(df) > 0 and isinstance(df.index, pd.DatetimeIndex):
+            self._start = df.index.min() if self._start is None else min(self._start, df.index.min())
+            self._end = df.index.max() if self._end is None else max(self._end, df.index.max())
+
+    def close(self):
+        if self._writer is None:
+            return
+        self._writer.close()
+        os.replace(self._tmp_path, self.path)
+        _remove_previous_files(self.commodity, self.path, self.directory)
+        entry = _manifest_record(self.path, self._start, self._end, self._hasher)
+        update_manifest(self.commodity, None, self.path, self.directory, entry=entry)
+
+    def abort(self):
+        if self._writer is not None:
+            self._writer.close()
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+
+def list_available_commodities(commodities, directory=PROCESSED_DIR):
+    """
+    List the commodities that have processed data, without loading the data.
+
+    The manifest is the source of truth. Processed files written before the
+    manifest existed are indexed once, the first time they are seen.
+
+    Parameters:
+    -----------
+    commodities : list
+        Commodity names to look for
+    directory : str
+        Directory holding the processed files
+
+    Returns:
+    --------
+    dict
+        Mapping of each available commodity to its manifest entry, in the
+        order given
+    """
+    manifest = read_manifest(directory)
+    available = {}
+
+    for commodity in commodities:
+        entry = manifest.get(commodity)
+        if entry is None or not os.path.exists(os.path.join(directory, entry['file'])):
+            path, _ = find_processed_file(commodity, directory)
+            if path is None:
+                continue
+
+            df = read_processed(commodity, directory=directory, use_cache=False)
+            path, _ = find_processed_file(commodity, directory)
+            entry = update_manifest(commodity, df, path, directory)
+
+        if entry['rows'] > 0:
+            available[commodity] = entry
+
+    return available
+
+
+def read_processed(commodity, columns=None, directory=PROCESSED_DIR, use_cache=True):
+    """
+    Read processed data for a commodity.
+
+    A legacy CSV file is migrated to the default columnar format on first read.
+
+    Parameters:
+    -----------
+    commodity : str
+        Name of the commodity
+    columns : list, optional
+        Columns to read. The date index is always included.
+    directory : str
+        Directory holding the processed files
+    use_cache : bool
+        Serve repeated reads of an unchanged file from the in-process cache
+
+    Returns:
+    --------
+    pd.DataFrame
+        The processed data, or an empty DataFrame if none exists
+    """
+    path, storage = find_processed_file(commodity, directory)
+    if path is None:
+        return pd.DataFrame()
+
+    if storage.name == 'csv' and DEFAULT_FORMAT != 'csv':
+        path, storage = migrate_file(path, directory=directory)
+
+    if not use_cache:
+        return _read_segments(storage, path, columns)
+    return dataframe_cache.get_or_load(
+        path, lambda: _read_segments(storage, path, columns), columns=columns,
+        files=[path] + segment_files(path)
+    )
+
+
+def migrate_file(csv_path, fmt=None, directory=PROCESSED_DIR, remove_csv=False):
+    """
+    Convert a processed CSV file to a columnar format.
+
+    Returns:
+    --------
+    tuple
+        (path, storage) of the converted file
+    """
+    storage = get_storage(fmt)
+    commodity = os.path.splitext(os.path.basename(csv_path))[0]
+    df = _read_segments(CsvStorage(), csv_path)
+    path = _store(df, commodity, storage.name, directory, keep=() if remove_csv else (csv_path,))
+    return path, storage
+
+
+def migrate_processed_data(directory=PROCESSED_DIR, fmt=None, remove_csv=False):
+    """
+    One-shot migration of every processed CSV file in a directory.
+
+    Files that already have an up-to-date columnar copy are skipped.
+
+    Returns:
+    --------
+    list
+        Paths of the files that were written
+    """
+    storage = get_storage(fmt)
+    migrated = []
+    for csv_path in sorted(glob.glob(os.path.join(directory, '*.csv'))):
+        commodity = os.path.splitext(os.path.basename(csv_path))[0]
+        target = processed_path(commodity, storage.name, directory)
+        if os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(csv_path):
+            continue
+        path, _ = migrate_file(csv_path, storage.name, directory, remove_csv)
+        migrated.append(path)
+    return migrated
+
+
+def import_csv(csv_path, commodity, fmt=None, directory=PROCESSED_DIR):
+    """Import an external processed CSV file into the store."""
+    df = CsvStorage().read(csv_path)
+    return save_processed(df, commodity, fmt, directory)
+
+
+def export_csv(commodity, csv_path, directory=PROCESSED_DIR):
+    """Export processed data for a commodity to a CSV file."""
+    df = read_processed(commodity, directory=directory)
+    df.to_csv(csv_path)
+    return csv_path
+
+
+if __name__ == "__main__":
+    for path in migrate_processed_data():
+        print(f"Migrated {path}")
@@ -0,0 +1,133 @@
+"""
+Downloads for the Oil & Gas Market Optimization system.
+This module builds download files of processed commodity data on request.
+
+Files are serialized chunk by chunk straight into a compressed buffer, so the
+uncompressed CSV text never exists in memory as a whole. Nothing is built until
+a download is requested, and the page only carries a download button, not the data.
+"""
+
+import io
+import gzip
+import zipfile
+
+from data_storage import (
+    PYARROW_AVAILABLE, find_processed_file, pyarrow_modules, read_processed, segment_files
+)
+
+# Rows serialized per chunk
+DOWNLOAD_CHUNKSIZE = 50_000
+
+# Format to (file extension, MIME type)
+DOWNLOAD_FORMATS = {
+    'csv.gz': ('.csv.gz', 'application/gzip'),
+    'parquet': ('.parquet', 'application/vnd.apache.parquet'),
+}
+
+
+def available_formats():
+    """Return the download formats supported in this environment."""
+    return [fmt for fmt in DOWNLOAD_FORMATS if fmt != 'parquet' or PYARROW_AVAILABLE]
+
+
+def download_filename(commodity, fmt):
+    """Return the file name of a commodity's processed data in a download format."""
+    return f"{commodity}_processed{DOWNLOAD_FORMATS[fmt][0]}"
+
+
+def download_mime(fmt):
+    """Return the MIME type of a download format."""
+    return DOWNLOAD_FORMATS[fmt][1]
+
+
+def _chunks(df, chunksize):
+    for start in range(0, len(df), chunksize):
+        yield df.iloc[start:start + chunksize]
+
+
+def write_csv(df, fileobj, chunksize=DOWNLOAD_CHUNKSIZE):
+    """Write a DataFrame as CSV text to a binary file object, chunk by chunk."""
+    text = io.TextIOWrapper(fileobj, encoding='utf-8', newline='')
+    try:
+        if df.empty:
+            df.to_csv(text)
+        for i, chunk in enumerate(_chunks(df, chunksize)):
+            chunk.to_csv(text, header=(i == 0))
+        text.flush()
+    finally:
+        # Leave the underlying file open for the caller
+        text.detach()
+
+
+def write_parquet(df, fileobj, chunksize=DOWNLOAD_CHUNKSIZE):
+    """Write a DataFrame as Parquet to a binary file object, one row group per chunk."""
+    if not PYARROW_AVAILABLE:
+        raise ImportError("pyarrow is required for Parquet downloads")
+    pa, _, pq = pyarrow_modules()
+
+    schema = pa.Schema.from_pandas(df, preserve_index=True)
+    with pq.ParquetWriter(fileobj, schema) as writer:
+        for chunk in _chunks(df, chunksize):
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=True))
+
+
+def build_download(commodity, fmt='csv.gz'):
+    """
+    Build a download file of a commodity's processed data.
+
+    Parameters:
+    -----------
+    commodity : str
+        Name of the commodity
+    fmt : str
+        'csv.gz' or 'parquet'
+
+    Returns:
+    --------
+    bytes
+        Contents of the file
+    """
+    if fmt not in DOWNLOAD_FORMATS:
+        raise ValueError(f"Unknown download format '{fmt}'. Choose from {', '.join(DOWNLOAD_FORMATS)}.")
+
+    # Stored Parquet files without appended segments are served as they are
+    path, storage = find_processed_file(commodity)
+    if fmt == 'parquet' and storage is not None and storage.name == 'parquet' and not segment_files(path):
+        with open(path, 'rb') as f:
+            return f.read()
+
+    df = read_processed(commodity)
+    buffer = io.BytesIO()
+    if fmt == 'csv.gz':
+        with gzip.GzipFile(fileobj=buffer, mode='wb', mtime=0) as gz:
+            write_csv(df, gz)
+    else:
+        write_parquet(df, buffer)
+    return buffer.getvalue()
+
+
+def build_bundle(commodities, fmt='csv.gz'):
+    """
+    Build a zip file with the processed data of several commodities.
+
+    CSV files are deflated as they are written into the archive; Parquet
+    files are already compressed and are stored as they are.
+
+    Returns:
+    --------
+    bytes
+        Contents of the zip file
+    """
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        for commodity in commodities:
+            if fmt == 'parquet':
+                archive.writestr(download_filename(commodity, fmt), build_download(commodity, fmt))
+                continue
+
+            # Plain CSV inside the archive, compressed by the zip itself
+            info = zipfile.ZipInfo(f"{commodity}_processed.csv")
+            info.compress_type = zipfile.ZIP_DEFLATED
+            with archive.open(info, 'w') as entry:
+                write_csv(read_processed(commodity), entry)
+    return buffer.getvalue()
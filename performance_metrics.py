@@ -0,0 +1,262 @@
+"""
+Performance metrics for the Oil & Gas Market Optimization system.
+This module computes strategy performance metrics as numbers for many return
+series at once. Metrics are formatted into strings only for display.
+"""
+
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+# Assuming daily returns
+PERIODS_PER_YEAR = 252
+
+# Metric name to display name
+PERFORMANCE_METRICS = {
+    'total_return': 'Total Return',
+    'annualized_return': 'Annualized Return',
+    'volatility': 'Volatility',
+    'sharpe_ratio': 'Sharpe Ratio',
+    'sortino_ratio': 'Sortino Ratio',
+    'calmar_ratio': 'Calmar Ratio',
+    'max_drawdown': 'Max Drawdown',
+    'win_rate': 'Win Rate',
+}
+
+# Metric name to display format
+METRIC_FORMATS = {
+    'total_return': '{:.2%}',
+    'annualized_return': '{:.2%}',
+    'volatility': '{:.2%}',
+    'sharpe_ratio': '{:.2f}',
+    'sortino_ratio': '{:.2f}',
+    'calmar_ratio': '{:.2f}',
+    'max_drawdown': '{:.2%}',
+    'win_rate': '{:.2%}',
+}
+
+# About one quarter of trading days
+ROLLING_WINDOW = 63
+
+
+def batch_metrics(strategy_returns, n_periods_total=None, periods_per_year=PERIODS_PER_YEAR):
+    """
+    Compute performance metrics for many return series at once.
+
+    All metrics come from one pass over the block: a single cumulative
+    product gives the total return and the drawdowns. Missing returns are
+    skipped.
+
+    Parameters:
+    -----------
+    strategy_returns : np.ndarray
+        Array of shape (n_series, n_periods)
+    n_periods_total : int or np.ndarray, optional
+        Length of each original series including missing returns, used as
+        the win-rate denominator. Defaults to the number of returns present.
+    periods_per_year : int
+        Number of periods in a year, for annualizing
+
+    Returns:
+    --------
+    dict
+        Metric name (see PERFORMANCE_METRICS) to array of shape (n_series,)
+    """
+    missing = np.isnan(strategy_returns)
+    has_missing = missing.any()
+    if has_missing:
+        m = (~missing).sum(axis=1)
+        strategy_returns = np.where(missing, 0.0, strategy_returns)
+    else:
+        m = np.full(len(strategy_returns), strategy_returns.shape[1])
+    growth = np.cumprod(1 + strategy_returns, axis=1)
+
+    total_return = growth[:, -1] - 1
+    n_years = m / periods_per_year
+    with np.errstate(divide='ignore', invalid='ignore'):
+        annualized_return = np.where(n_years > 0, (1 + total_return) ** (1 / n_years) - 1, 0.0)
+
+    if has_missing:
+        # Sample standard deviation of the returns present
+        mean = strategy_returns.sum(axis=1) / np.maximum(m, 1)
+        squares = np.where(missing, 0.0, (strategy_returns - mean[:, None]) ** 2).sum(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            volatility = np.sqrt(squares / (m - 1)) * np.sqrt(periods_per_year)
+        volatility[m < 2] = np.nan
+    else:
+        volatility = strategy_returns.std(axis=1, ddof=1) * np.sqrt(periods_per_year)
+
+    # Downside deviation below a zero target; missing returns are zero here and add nothing
+    downside = np.minimum(strategy_returns, 0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        downside_deviation = np.sqrt(np.einsum('ij,ij->i', downside, downside) / m) * np.sqrt(periods_per_year)
+        sharpe_ratio = np.where(volatility > 0, annualized_return / volatility, 0.0)
+        sortino_ratio = np.where(downside_deviation > 0, annualized_return / downside_deviation, 0.0)
+
+    # Drawdowns only over the periods with a return
+    cumulative = growth - 1
+    if has_missing:
+        cumulative[missing] = np.nan
+    peak = np.fmax.accumulate(cumulative, axis=1)
+    max_drawdown = np.fmin.reduce((cumulative - peak) / (1 + peak), axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        calmar_ratio = np.where(max_drawdown < 0, annualized_return / -max_drawdown, 0.0)
+
+    n_total = m if n_periods_total is None else n_periods_total
+    with np.errstate(divide='ignore', invalid='ignore'):
+        win_rate = (strategy_returns > 0).sum(axis=1) / n_total
+
+    return {
+        'total_return': total_return,
+        'annualized_return': annualized_return,
+        'volatility': volatility,
+        'sharpe_ratio': sharpe_ratio,
+        'sortino_ratio': sortino_ratio,
+        'calmar_ratio': calmar_ratio,
+        'max_drawdown': max_drawdown,
+        'win_rate': win_rate,
+    }
+
+
+def performance_metrics(returns, periods_per_year=PERIODS_PER_YEAR):
+    """
+    Compute the performance metrics of one or several return series.
+
+    Missing returns are skipped, except in the win rate, which counts them
+    as periods without a win.
+
+    Parameters:
+    -----------
+    returns : pd.Series, pd.DataFrame or np.ndarray
+        A return series, or one series per column of a DataFrame or 2-D array
+    periods_per_year : int
+        Number of periods in a year, for annualizing
+
+    Returns:
+    --------
+    dict or pd.DataFrame
+        For one series, metric name to float. For several, a DataFrame with
+        one row per series and one column per metric.
+    """
+    values = np.asarray(returns, dtype=np.float64)
+    single = values.ndim == 1
+    block = values[None, :] if single else values.T
+    metrics = batch_metrics(block, n_periods_total=block.shape[1], periods_per_year=periods_per_year)
+
+    if single:
+        return {name: float(value[0]) for name, value in metrics.items()}
+    index = returns.columns if isinstance(returns, pd.DataFrame) else None
+    return pd.DataFrame(metrics, index=index)
+
+
+def format_metrics(metrics):
+    """
+    Format numeric metrics for display.
+
+    Parameters:
+    -----------
+    metrics : dict or pd.Series
+        Metric name to value, as from performance_metrics
+
+    Returns:
+    --------
+    dict
+        Display name to formatted string
+    """
+    return {
+        PERFORMANCE_METRICS[name]: METRIC_FORMATS[name].format(value)
+        for name, value in metrics.items() if name in PERFORMANCE_METRICS
+    }
+
+
+def rolling_max(values, window):
+    """
+    Compute the maximum of each trailing window with a monotonic deque.
+
+    The deque holds the positions of decreasing values, so every value is
+    pushed and popped at most once and the whole series takes O(n).
+    Missing values are skipped.
+
+    Returns:
+    --------
+    np.ndarray
+        Maximum of the ``window`` values ending at each position, NaN where
+        the window has no values
+    """
+    values = np.asarray(values, dtype=np.float64).tolist()
+    maxima = np.full(len(values), np.nan)
+    candidates = deque()
+    for t, value in enumerate(values):
+        if candidates and candidates[0] <= t - window:
+            candidates.popleft()
+        if value == value:
+            while candidates and values[candidates[-1]] <= value:
+                candidates.pop()
+            candidates.append(t)
+        if candidates:
+            maxima[t] = values[candidates[0]]
+    return maxima
+
+
+def rolling_metrics(returns, window=ROLLING_WINDOW, periods_per_year=PERIODS_PER_YEAR):
+    """
+    Compute rolling performance metrics of a return series in O(n).
+
+    Volatility, Sharpe ratio and hit rate come from prefix sums of the returns,
+    their squares and their wins, so each window costs O(1). The rolling
+    drawdown measures equity against its peak within the window, found with
+    ``rolling_max``; the underwater curve measures it against the peak so far.
+
+    Parameters:
+    -----------
+    returns : pd.Series
+        Return series; missing returns are skipped
+    window : int
+        Number of periods in each window; a window is complete once it holds
+        ``window`` returns
+    periods_per_year : int
+        Number of periods in a year, for annualizing
+
+    Returns:
+    --------
+    pd.DataFrame
+        Columns 'volatility', 'sharpe_ratio', 'hit_rate', 'drawdown' and
+        'underwater', indexed like ``returns``
+    """
+    values = np.asarray(returns, dtype=np.float64)
+    missing = np.isnan(values)
+    present = np.where(missing, 0.0, values)
+
+    def window_sums(x):
+        csum = np.concatenate(([0.0], np.cumsum(x)))
+        sums = np.full(len(x), np.nan)
+        if window <= len(x):
+            sums[window - 1:] = csum[window:] - csum[:-window]
+        return sums
+
+    count = window_sums(~missing)
+    complete = count == window
+    mean = window_sums(present) / window
+    # Sample variance from the sums of squares, floored at zero against rounding
+    variance = np.maximum(window_sums(present * present) - window * mean * mean, 0.0) / (window - 1)
+    volatility = np.sqrt(variance) * np.sqrt(periods_per_year)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sharpe_ratio = np.where(volatility > 0, mean * periods_per_year / volatility, 0.0)
+    hit_rate = window_sums(present > 0) / window
+
+    equity = np.cumprod(1 + present)
+    equity[missing] = np.nan
+    drawdown = equity / rolling_max(equity, window) - 1
+    underwater = equity / np.fmax.accumulate(equity) - 1
+
+    data = {
+        'volatility': volatility,
+        'sharpe_ratio': sharpe_ratio,
+        'hit_rate': hit_rate,
+    }
+    data = {name: np.where(complete, series, np.nan) for name, series in data.items()}
+    data['drawdown'] = drawdown
+    data['underwater'] = underwater
+    index = returns.index if isinstance(returns, pd.Series) else None
+    return pd.DataFrame(data, index=index)
@@ -3,8 +3,12 @@ Q&A component for the Oil & Gas Market Optimization system.
 This module provides a simple question and answer functionality.
 """
 
+import os
+
 import streamlit as st
-import re
+
+from qa_index import QAIndex
+from qa_knowledge_base import load_knowledge_base
 
 # Dictionary of questions and answers
 QA_DATABASE = {
@@ -68,53 +72,36 @@ QA_DATABASE = {
         "Pull the latest changes from the GitHub repository and reinstall dependencies if needed: `git pull` followed by `pip install -r requirements.txt`."
 }
 
-def find_best_match(question, qa_database):
+def knowledge_base():
+    """Load QA_DATABASE and the knowledge base files, recompiled only when a file changes."""
+    return load_knowledge_base(QA_DATABASE)
+
+def find_best_match(question, qa_database=None):
     """
     Find the best matching question in the database.
     
+    Questions are scored by the cosine similarity of their TF-IDF weights,
+    falling back to word overlap when no question is similar enough.
+    
     Parameters:
     -----------
     question : str
         The user's question
-    qa_database : dict
-        Dictionary of questions and answers
+    qa_database : dict, optional
+        Dictionary of questions and answers. Defaults to the compiled
+        knowledge base: QA_DATABASE plus the knowledge base files.
         
     Returns:
     --------
     tuple
         (best_match_question, best_match_answer, match_score)
     """
-    # Preprocess the question
-    question = question.lower().strip()
-    if question.endswith('?'):
-        question = question[:-1]
-    
-    best_match = None
-    best_score = 0
-    
-    for q in qa_database.keys():
-        # Simple word overlap score
-        q_words = set(q.split())
-        question_words = set(question.split())
-        common_words = q_words.intersection(question_words)
-        
-        if len(common_words) > 0:
-            # Calculate score based on word overlap
-            score = len(common_words) / max(len(q_words), len(question_words))
-            
-            # Boost score for key phrase matches
-            for phrase in q_words:
-                if phrase in question and len(phrase) > 3:  # Only consider phrases longer than 3 chars
-                    score += 0.1
-            
-            if score > best_score:
-                best_score = score
-                best_match = q
-    
-    if best_match and best_score > 0.3:  # Threshold for a good match
-        return best_match, qa_database[best_match], best_score
-    else:
-        return None, None, 0
+    index = knowledge_base()['index'] if qa_database is None else QAIndex(qa_database)
+    return index.best_match(question)
+
+def _ask(question):
+    """Put a question in the question box; used as a button callback."""
+    st.session_state.user_question = question
 
 def qa_interface():
     """
@@ -127,32 +114,29 @@ def qa_interface():
     You can ask about data formats, trading strategies, risk analysis, or technical issues.
     """)
     
+    kb = knowledge_base()
+    for path, error in kb['errors'].items():
+        st.warning(f"Skipped knowledge base file {os.path.relpath(path)}: {error}")
+    st.caption(f"{len(kb['index'])} questions in the knowledge base")
+    
     # User input
-    user_question = st.text_input("Your question:", "")
+    user_question = st.text_input("Your question:", key="user_question")
     
     if st.button("Ask") or user_question:
         if user_question:
             # Find the best match
-            _, answer, score = find_best_match(user_question, QA_DATABASE)
+            match, answer, score = kb['index'].best_match(user_question)
             
             if answer:
                 st.success("Answer:")
                 st.write(answer)
                 
-                # Show related questions
-                st.subheader("You might also be interested in:")
-                related_questions = []
-                for q in QA_DATABASE.keys():
-                    if q != user_question.lower().strip():
-                        _, _, rel_score = find_best_match(q, {user_question.lower().strip(): ""})
-                        if rel_score > 0.2:
-                            related_questions.append(q)
-                
-                # Display up to 3 related questions
-                for i, q in enumerate(related_questions[:3]):
-                    if st.button(f"{q.capitalize()}?", key=f"related_{i}"):
-                        st.session_state.user_question = q
-                        st.experimental_rerun()
+                # Related questions were ranked when the index was built
+                related_questions = kb['index'].related_questions(match)
+                if related_questions:
+                    st.subheader("You might also be interested in:")
+                for i, q in enumerate(related_questions):
+                    st.button(f"{q.capitalize()}?", key=f"related_{i}", on_click=_ask, args=(q,))
             else:
                 st.error("I don't have a specific answer for that question. Please try rephrasing or check the documentation.")
                 st.info("You can find comprehensive documentation in the INSTRUCTIONS.md and USAGE_GUIDE.md files.")
@@ -168,9 +152,7 @@ def qa_interface():
         ]
         
         for i, q in enumerate(example_questions):
-            if st.button(q, key=f"example_{i}"):
-                st.session_state.user_question = q
-                st.experimental_rerun()
+            st.button(q, key=f"example_{i}", on_click=_ask, args=(q,))
 
 if __name__ == "__main__":
     st.set_page_config(page_title="Q&A - Oil & Gas Market Optimization", page_icon="📈")
@@ -0,0 +1,314 @@
+"""
+Question matching for the Oil & Gas Market Optimization system.
+This module compiles a question and answer knowledge base into an inverted
+index with TF-IDF weights, without depending on Streamlit.
+
+Each question is reduced to its terms: lowercase words without stopwords,
+plus the pairs of adjacent words so that matching phrases score higher than
+scattered words. A query only visits the postings of its own terms, so its
+cost depends on how common its terms are rather than on the number of entries.
+"""
+
+import math
+import re
+
+import numpy as np
+
+# Words too common in questions to tell entries apart
+STOPWORDS = frozenset("""
+a about am an and any are as at be been but by can could do does did for from
+had has have how i if in into is it its me my of on or our should so than that
+the their them then there these they this to us was we what when where which
+who why will with would you your
+""".split())
+
+# Minimum cosine similarity for a question to count as a match
+MATCH_THRESHOLD = 0.25
+
+# Weight of a query term the index has never seen, relative to the idf of a
+# term that appears in a single question
+UNKNOWN_TERM_WEIGHT = 2.0
+
+# Minimum word-overlap score of the fallback matcher, as in the original matcher
+OVERLAP_THRESHOLD = 0.3
+
+# Related questions kept for each entry, and their minimum similarity
+RELATED_LIMIT = 3
+RELATED_THRESHOLD = 0.03
+
+# Entries at least this similar are near-duplicates, e.g. the same FAQ entry
+# from two sources, and are not suggested as related
+DUPLICATE_THRESHOLD = 0.9
+
+# Terms in more entries than this say little about relatedness and are skipped
+# when comparing entries, which keeps the comparison close to linear
+RELATED_MAX_POSTINGS = 200
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def _stem(word):
+    """Strip a plural 's' so that 'strategies' and 'strategy' share a term."""
+    if word.endswith('ies') and len(word) > 4:
+        return word[:-3] + 'y'
+    if word.endswith('s') and not word.endswith('ss') and len(word) > 3:
+        return word[:-1]
+    return word
+
+
+def tokenize(text):
+    """Split text into lowercase, stemmed words without stopwords."""
+    return [_stem(word) for word in _WORD.findall(text.lower()) if word not in STOPWORDS]
+
+
+def terms(text):
+    """Return the index terms of a text: its words and its pairs of adjacent words."""
+    words = tokenize(text)
+    return words + [f"{first} {second}" for first, second in zip(words, words[1:])]
+
+
+class QAIndex:
+    """
+    Inverted index of a question and answer knowledge base.
+
+    Questions are weighted with TF-IDF and normalized to unit length, so the
+    score of a query against a question is their cosine similarity. The most
+    similar other entries of every entry, compared on their question and
+    answer text, are found while the index is built.
+
+    Parameters:
+    -----------
+    qa_database : dict
+        Question to answer
+    """
+
+    def __init__(self, qa_database):
+        self.questions = list(qa_database)
+        self.answers = [qa_database[q] for q in self.questions]
+        self._positions = {q: doc_id for doc_id, q in enumerate(self.questions)}
+
+        self.idf, self.postings = self._build_postings(self.questions)
+        self.word_postings = {}
+        for doc_id, q in enumerate(self.questions):
+            for word in set(q.split()):
+                self.word_postings.setdefault(word, []).append(doc_id)
+        _, entry_postings = self._build_postings(
+            [f"{q} {a}" for q, a in zip(self.questions, self.answers)]
+        )
+        self.related = self._related_entries(entry_postings)
+
+    def __len__(self):
+        return len(self.questions)
+
+    @staticmethod
+    def _term_counts(doc_terms):
+        counts = {}
+        for term in doc_terms:
+            counts[term] = counts.get(term, 0) + 1
+        return counts
+
+    @classmethod
+    def _build_postings(cls, texts):
+        """
+        Weigh the terms of texts with TF-IDF.
+
+        Returns:
+        --------
+        tuple
+            (term to idf, term to [(text id, weight)] with unit-length text vectors)
+        """
+        counts = [cls._term_counts(terms(text)) for text in texts]
+        n = len(counts)
+        document_frequency = {}
+        for doc in counts:
+            for term in doc:
+                document_frequency[term] = document_frequency.get(term, 0) + 1
+        idf = {term: math.log(1 + n / df) for term, df in document_frequency.items()}
+
+        postings = {}
+        for doc_id, doc in enumerate(counts):
+            weights = {term: tf * idf[term] for term, tf in doc.items()}
+            norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+            for term, weight in weights.items():
+                postings.setdefault(term, []).append((doc_id, weight / norm))
+        return idf, postings
+
+    def _related_entries(self, postings):
+        """
+        Rank the other entries of every entry by cosine similarity.
+
+        Every pair of entries sharing a term gets the product of their weights
+        for it. The products of all pairs are collected into flat arrays and
+        summed per pair with one sort, so no Python loop runs over pairs.
+        """
+        n = len(self.questions)
+        firsts, seconds, products = [], [], []
+        for entries in postings.values():
+            if len(entries) < 2 or len(entries) > RELATED_MAX_POSTINGS:
+                continue
+            docs, weights = np.array(entries).T
+            i, j = np.triu_indices(len(entries), k=1)
+            firsts.append(docs[i])
+            seconds.append(docs[j])
+            products.append(weights[i] * weights[j])
+
+        if firsts:
+            first = np.concatenate(firsts).astype(np.int64)
+            second = np.concatenate(seconds).astype(np.int64)
+            product = np.concatenate(products)
+            # Both orders of every pair, summed per (entry, other entry) key
+            keys, inverse = np.unique(
+                np.concatenate((first * n + second, second * n + first)), return_inverse=True
+            )
+            pair_scores = np.bincount(inverse, weights=np.concatenate((product, product)))
+            owners, pair_others = np.divmod(keys, n)
+        else:
+            pair_scores = np.empty(0)
+            owners = pair_others = np.empty(0, dtype=np.int64)
+        # Pairs are sorted by entry, so each entry's pairs are one slice
+        bounds = np.searchsorted(owners, np.arange(n + 1))
+
+        duplicates = {}
+        for doc_id in range(n):
+            start, end = bounds[doc_id], bounds[doc_id + 1]
+            close = pair_others[start:end][pair_scores[start:end] >= DUPLICATE_THRESHOLD]
+            if len(close):
+                duplicates[doc_id] = set(close.tolist())
+
+        related = []
+        for doc_id in range(n):
+            start, end = bounds[doc_id], bounds[doc_id + 1]
+            others = pair_others[start:end]
+            scores = pair_scores[start:end]
+            keep = (scores > RELATED_THRESHOLD) & (scores < DUPLICATE_THRESHOLD)
+            others, scores = others[keep], scores[keep]
+
+            # Best first, without two near-duplicates of each other
+            chosen = []
+            for i in np.lexsort((others, -scores)):
+                other = int(others[i])
+                if any(other in duplicates.get(c, ()) for c, _ in chosen):
+                    continue
+                chosen.append((other, float(scores[i])))
+                if len(chosen) == RELATED_LIMIT:
+                    break
+            related.append(chosen)
+        return related
+
+    def related_questions(self, question):
+        """
+        Return the questions most similar to a question of the index.
+
+        Returns:
+        --------
+        list
+            Up to RELATED_LIMIT questions, most similar first
+        """
+        doc_id = self._positions.get(question)
+        if doc_id is None:
+            return []
+        return [self.questions[other] for other, _ in self.related[doc_id]]
+
+    def query_vector(self, text):
+        """
+        Return the TF-IDF weights of the known terms of a text.
+
+        Terms the index has never seen are weighted like a term of a single
+        question, ``log(1 + n)``, times UNKNOWN_TERM_WEIGHT, and count towards
+        the length the vector is normalized by. Words that match no question
+        therefore lower the score instead of being dropped, so a query sharing
+        one word with a question does not score as if that word were all it said.
+        """
+        unknown_idf = UNKNOWN_TERM_WEIGHT * math.log(1 + len(self.questions))
+        weights = {}
+        unknown = 0.0
+        for term, tf in self._term_counts(terms(text)).items():
+            if term in self.idf:
+                weights[term] = tf * self.idf[term]
+            else:
+                unknown += (tf * unknown_idf) ** 2
+        norm = math.sqrt(sum(w * w for w in weights.values()) + unknown)
+        return {term: w / norm for term, w in weights.items()} if norm else {}
+
+    def scores(self, text):
+        """Return the cosine similarity of a text to every question it shares a term with."""
+        scores = {}
+        for term, query_weight in self.query_vector(text).items():
+            for doc_id, weight in self.postings[term]:
+                scores[doc_id] = scores.get(doc_id, 0.0) + query_weight * weight
+        return scores
+
+    def search(self, text, limit=1, threshold=MATCH_THRESHOLD):
+        """
+        Find the questions most similar to a text.
+
+        Returns:
+        --------
+        list
+            Up to ``limit`` (question id, score) pairs above ``threshold``,
+            best first
+        """
+        scores = self.scores(text)
+        ranked = sorted(
+            ((doc_id, score) for doc_id, score in scores.items() if score > threshold),
+            key=lambda item: (-item[1], item[0])
+        )
+        return ranked[:limit]
+
+    def overlap_match(self, text, threshold=OVERLAP_THRESHOLD):
+        """
+        Find the question sharing the most words with a text, as the original matcher did.
+
+        The score is the number of shared words over the word count of the
+        longer of the two, plus 0.1 for every word of the question longer than
+        three characters that appears in the text. Stopwords count, so this
+        matches rephrasings such as 'how do i begin' that share no index term
+        with their question. Only questions sharing a word with the text are
+        scored.
+
+        Returns:
+        --------
+        tuple
+            (question id, score), or None without a match above ``threshold``
+        """
+        text = text.lower().strip()
+        if text.endswith('?'):
+            text = text[:-1]
+        words = set(text.split())
+
+        candidates = set()
+        for word in words:
+            candidates.update(self.word_postings.get(word, ()))
+
+        best = None
+        best_score = 0
+        for doc_id in sorted(candidates):
+            q_words = set(self.questions[doc_id].split())
+            score = len(q_words & words) / max(len(q_words), len(words))
+            score += 0.1 * sum(1 for word in q_words if len(word) > 3 and word in text)
+            if score > best_score:
+                best, best_score = doc_id, score
+        return (best, best_score) if best is not None and best_score > threshold else None
+
+    def best_match(self, text, threshold=MATCH_THRESHOLD):
+        """
+        Find the best matching question.
+
+        Questions are ranked by TF-IDF similarity. Without a question above
+        ``threshold``, the word-overlap matcher of ``overlap_match`` is tried,
+        so no question the original matcher answered goes unanswered.
+
+        Returns:
+        --------
+        tuple
+            (question, answer, score), or (None, None, 0) without a match
+        """
+        found = self.search(text, 1, threshold)
+        if found:
+            doc_id, score = found[0]
+        else:
+            found = self.overlap_match(text)
+            if found is None:
+                return None, None, 0
+            doc_id, score = found
+        return self.questions[doc_id], self.answers[doc_id], score
@@ -0,0 +1,309 @@
+"""
+Q&A knowledge base for the Oil & Gas Market Optimization system.
+This module loads question and answer entries from files and keeps their
+compiled index on disk, without depending on Streamlit.
+
+Entries come from the FAQ section of USAGE_GUIDE.md and from YAML, JSON and
+Markdown files in the knowledge_base/ directory, on top of the built-in
+entries. Sources are only parsed again when their modification time or size
+changes, and the compiled QAIndex is stored next to the processed data so
+that a restart loads it without parsing anything. Within one process the
+index is kept in memory and a call only checks the sources' file stats.
+
+File formats:
+
+- JSON or YAML: a mapping of question to answer, or a list of mappings with
+  'question' and 'answer' keys
+- Markdown: FAQ entries written as a ``**Q:** question`` or ``**Q: question**``
+  line followed by an ``A: answer`` paragraph, as in USAGE_GUIDE.md. A fenced
+  code block in the answer is kept as it is.
+"""
+
+import os
+import re
+import glob
+import json
+import pickle
+import hashlib
+
+from qa_index import QAIndex
+
+try:
+    import yaml
+except ImportError:  # pragma: no cover - depends on the environment
+    yaml = None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+KNOWLEDGE_BASE_DIR = os.path.join(BASE_DIR, 'knowledge_base')
+DEFAULT_SOURCES = (os.path.join(BASE_DIR, 'USAGE_GUIDE.md'), KNOWLEDGE_BASE_DIR)
+INDEX_PATH = os.path.join(BASE_DIR, 'data', 'qa_index.pkl')
+
+SOURCE_EXTENSIONS = ('.md', '.json', '.yaml', '.yml')
+
+# Bump when the parsers or QAIndex change, so that stored indexes are rebuilt
+INDEX_VERSION = 3
+
+# '**Q:** question' or '**Q: question**'
+_QUESTION = re.compile(r'^\*\*Q:\*\*\s*(.+?)\s*$|^\*\*Q:\s*(.+?)\*\*\s*$')
+_ANSWER = re.compile(r'^(?:\*\*A:\*\*|A:)\s*(.*)$')
+_FENCE = '```'
+
+# Index kept in memory by (sources, built-in entries) signature
+_loaded = {}
+
+
+def normalize_question(question):
+    """Lowercase a question and strip its question mark, as QA_DATABASE keys are written."""
+    return ' '.join(question.lower().split()).rstrip('?').strip()
+
+
+def _answer_text(parts):
+    """Join answer lines into one paragraph, keeping fenced code blocks on their own lines."""
+    chunks = []
+    prose = []
+    for part in parts:
+        if part.startswith(_FENCE):
+            if prose:
+                chunks.append(' '.join(prose))
+                prose = []
+            chunks.append(part)
+        elif part:
+            prose.append(part)
+    if prose:
+        chunks.append(' '.join(prose))
+    return '\n'.join(chunks)
+
+
+def parse_markdown(text):
+    """
+    Extract FAQ entries from Markdown.
+
+    An answer runs from its ``A:`` line to the next blank line or heading.
+    Fenced code blocks in it are kept line by line, so that commands still
+    display as code.
+
+    Returns:
+    --------
+    list
+        (question, answer) pairs
+    """
+    entries = []
+    question = None
+    answer = None
+    block = None
+    for line in text.splitlines() + ['']:
+        stripped = line.strip()
+        if block is not None:
+            # Inside a code block until its closing fence
+            block.append(line.rstrip())
+            if stripped.startswith(_FENCE):
+                answer.append('\n'.join(block))
+                block = None
+            continue
+
+        match = _QUESTION.match(stripped)
+        if match:
+            if question and answer:
+                entries.append((question, _answer_text(answer)))
+            question, answer = match.group(1) or match.group(2), None
+        elif question and answer is None and _ANSWER.match(stripped):
+            answer = [_ANSWER.match(stripped).group(1)]
+        elif question and answer is not None and stripped.startswith(_FENCE):
+            block = [stripped]
+        elif question and answer is not None and stripped and not stripped.startswith('#'):
+            answer.append(stripped)
+        elif question and answer is not None:
+            # A blank line or heading ends the answer
+            entries.append((question, _answer_text(answer)))
+            question = answer = None
+
+    if block is not None:
+        # A code block left open at the end of the file
+        answer.append('\n'.join(block).rstrip() + '\n' + _FENCE)
+    if question and answer:
+        entries.append((question, _answer_text(answer)))
+    return entries
+
+
+def _structured_entries(data, path):
+    """Turn loaded JSON or YAML data into (question, answer) pairs."""
+    if isinstance(data, dict):
+        return [(str(q), str(a)) for q, a in data.items()]
+    if isinstance(data, list):
+        try:
+            return [(str(item['question']), str(item['answer'])) for item in data]
+        except (TypeError, KeyError):
+            pass
+    raise ValueError(
+        f"{path} must hold a mapping of question to answer, "
+        f"or a list of entries with 'question' and 'answer'"
+    )
+
+
+def parse_source(path):
+    """
+    Parse one knowledge base file.
+
+    Returns:
+    --------
+    list
+        (question, answer) pairs in file order
+    """
+    ext = os.path.splitext(path)[1].lower()
+    with open(path, encoding='utf-8') as f:
+        text = f.read()
+
+    if ext == '.md':
+        entries = parse_markdown(text)
+        if not entries:
+            raise ValueError(f"{path} has no '**Q:** question' lines followed by an 'A:' answer")
+        return entries
+    if ext == '.json':
+        return _structured_entries(json.loads(text), path)
+    if ext in ('.yaml', '.yml'):
+        if yaml is None:
+            raise ImportError("PyYAML is required for YAML knowledge base files")
+        return _structured_entries(yaml.safe_load(text) or {}, path)
+    raise ValueError(f"Unsupported knowledge base file: {path}")
+
+
+def find_sources(sources=DEFAULT_SOURCES):
+    """Expand files and directories into the sorted list of knowledge base files."""
+    paths = []
+    for source in sources:
+        if os.path.isdir(source):
+            paths.extend(sorted(
+                path for path in glob.glob(os.path.join(source, '**', '*'), recursive=True)
+                if path.lower().endswith(SOURCE_EXTENSIONS)
+            ))
+        elif os.path.isfile(source):
+            paths.append(source)
+    return paths
+
+
+def _stats(paths):
+    """Return (path, modification time, size) of every file."""
+    stats = []
+    for path in paths:
+        st = os.stat(path)
+        stats.append((path, st.st_mtime_ns, st.st_size))
+    return tuple(stats)
+
+
+def _builtin_digest(builtin):
+    return hashlib.sha256(json.dumps(list(builtin.items())).encode('utf-8')).hexdigest()
+
+
+def _read_index(path):
+    try:
+        with open(path, 'rb') as f:
+            stored = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        return None
+    return stored if isinstance(stored, dict) and stored.get('version') == INDEX_VERSION else None
+
+
+def _write_index(stored, path):
+    """Write the stored index through a temporary file so readers never see a partial file."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f'{path}.tmp-{os.getpid()}'
+    try:
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(stored, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def build_database(builtin, parsed):
+    """
+    Merge the built-in entries and the parsed sources into one question-to-answer dict.
+
+    Later sources override earlier ones for the same question. An entry whose
+    answer is already in the database under another question, ignoring
+    whitespace, is skipped, so the FAQ in USAGE_GUIDE.md does not repeat the
+    built-in entries.
+    """
+    database = dict(builtin)
+    answers = {' '.join(answer.split()) for answer in database.values()}
+    for entries in parsed.values():
+        for question, answer in entries:
+            question = normalize_question(question)
+            answer = answer.strip()
+            key = ' '.join(answer.split())
+            if not question or not key:
+                continue
+            if question not in database and key in answers:
+                continue
+            database[question] = answer
+            answers.add(key)
+    return database
+
+
+def load_knowledge_base(builtin=None, sources=DEFAULT_SOURCES, index_path=INDEX_PATH):
+    """
+    Load the compiled knowledge base, rebuilding only what changed.
+
+    Parameters:
+    -----------
+    builtin : dict, optional
+        Built-in question to answer entries, overridden by the sources
+    sources : sequence of str
+        Knowledge base files and directories
+    index_path : str
+        File the compiled index is stored in
+
+    Returns:
+    --------
+    dict
+        'index' (QAIndex of all entries) and 'errors' (path to error message
+        of the sources that could not be parsed)
+    """
+    builtin = builtin or {}
+    stats = _stats(find_sources(sources))
+    digest = _builtin_digest(builtin)
+    signature = (stats, digest, os.path.abspath(index_path))
+
+    knowledge_base = _loaded.get(signature)
+    if knowledge_base is not None:
+        return knowledge_base
+
+    stored = _read_index(index_path)
+    if stored and stored['stats'] == stats and stored['builtin'] == digest:
+        knowledge_base = {'index': stored['index'], 'errors': stored['errors']}
+    else:
+        # Reuse the entries of unchanged files and parse only new or modified ones
+        previous = {path: (mtime, size, entries) for path, mtime, size, entries in (stored or {}).get('files', [])}
+        files = []
+        parsed = {}
+        errors = {}
+        for path, mtime, size in stats:
+            cached = previous.get(path)
+            if cached and cached[:2] == (mtime, size):
+                entries = cached[2]
+            else:
+                try:
+                    entries = parse_source(path)
+                except Exception as e:
+                    errors[path] = str(e)
+                    continue
+            files.append((path, mtime, size, entries))
+            parsed[path] = entries
+
+        index = QAIndex(build_database(builtin, parsed))
+        _write_index({
+            'version': INDEX_VERSION,
+            'stats': stats,
+            'builtin': digest,
+            'files': files,
+            'index': index,
+            'errors': errors,
+        }, index_path)
+        knowledge_base = {'index': index, 'errors': errors}
+
+    # Older signatures of the same index file are stale
+    for key in [key for key in _loaded if key[2] == signature[2]]:
+        del _loaded[key]
+    _loaded[signature] = knowledge_base
+    return knowledge_base
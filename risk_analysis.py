@@ -0,0 +1,309 @@
+"""
+Risk analysis for the Oil & Gas Market Optimization system.
+This module computes return statistics and Value at Risk without depending on Streamlit.
+"""
+
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+CONFIDENCE_LEVELS = (0.95, 0.99)
+
+def confidence_label(confidence_level):
+    """Format a confidence level for a label without rounding it, e.g. '95%' or '97.5%'."""
+    return f'{confidence_level * 100:g}%'
+
+def return_statistics(returns):
+    """Calculate summary statistics of daily returns."""
+    return {
+        'Mean Daily Return': returns.mean(),
+        'Daily Volatility': returns.std(),
+        'Annualized Volatility': returns.std() * np.sqrt(252),
+        'Minimum Return': returns.min(),
+        'Maximum Return': returns.max()
+    }
+
+def value_at_risk(returns, confidence_levels=CONFIDENCE_LEVELS):
+    """
+    Calculate historical and parametric Value at Risk of daily returns.
+
+    Parameters:
+    -----------
+    returns : pd.Series
+        Daily returns without missing values
+    confidence_levels : sequence of float
+        Confidence levels, e.g. 0.95
+
+    Returns:
+    --------
+    dict
+        Keys like '95% Historical VaR' and '95% Parametric VaR' mapped to the
+        loss as a positive fraction
+    """
+    var_values = {}
+
+    for cl in confidence_levels:
+        # Historical VaR
+        var_percentile = 1 - cl
+        historical_var = -np.percentile(returns, var_percentile * 100)
+
+        # Parametric VaR
+        z_score = NormalDist().inv_cdf(cl)
+        parametric_var = -(returns.mean() + z_score * returns.std())
+
+        var_values[f'{confidence_label(cl)} Historical VaR'] = historical_var
+        var_values[f'{confidence_label(cl)} Parametric VaR'] = parametric_var
+
+    return var_values
+
+# Monte Carlo simulation defaults
+SIMULATION_METHODS = {
+    'filtered_bootstrap': 'Filtered Historical Bootstrap',
+    'bootstrap': 'Historical Bootstrap',
+    'student_t': 'Student-t',
+    'gbm': 'Geometric Brownian Motion',
+}
+SIMULATION_CHUNK_SIZE = 100_000
+EWMA_LAMBDA = 0.94
+
+# About one year of trading days
+ROLLING_VAR_WINDOW = 250
+
+def ewma_volatility(returns, lam=EWMA_LAMBDA):
+    """
+    Calculate the EWMA (RiskMetrics) volatility of daily returns.
+
+    Returns:
+    --------
+    tuple
+        (volatility of each return, conditional on the returns before it;
+        volatility forecast for the next period)
+    """
+    returns = np.asarray(returns, dtype=np.float64)
+    variance = np.empty(len(returns) + 1)
+    variance[0] = returns.var()
+    for t, r in enumerate(returns):
+        variance[t + 1] = lam * variance[t] + (1 - lam) * r * r
+    return np.sqrt(variance[:-1]), np.sqrt(variance[-1])
+
+def student_t_dof(returns):
+    """Estimate Student-t degrees of freedom from the excess kurtosis of returns (method of moments)."""
+    returns = np.asarray(returns, dtype=np.float64)
+    centered = returns - returns.mean()
+    excess_kurtosis = np.mean(centered ** 4) / np.mean(centered ** 2) ** 2 - 3
+    # Kurtosis of a t distribution is 6 / (dof - 4); thin tails fall back to near-normal
+    return 6 / excess_kurtosis + 4 if excess_kurtosis > 0.05 else 124.0
+
+def _simulate_chunk(rng, size, method, horizon, model):
+    """Simulate the horizon returns of one chunk of scenarios."""
+    if method == 'bootstrap':
+        draws = rng.choice(model['returns'], size=(size, horizon))
+        return np.prod(1 + draws, axis=1) - 1
+
+    if method == 'filtered_bootstrap':
+        # Rescale standardized residuals by a volatility that evolves along each path
+        variance = np.full(size, model['sigma'] ** 2)
+        growth = np.ones(size)
+        for _ in range(horizon):
+            r = np.sqrt(variance) * rng.choice(model['residuals'], size=size)
+            growth *= 1 + r
+            variance = EWMA_LAMBDA * variance + (1 - EWMA_LAMBDA) * r * r
+        return growth - 1
+
+    if method == 'student_t':
+        dof = model['dof']
+        shocks = rng.standard_t(dof, size=(size, horizon)).sum(axis=1) * np.sqrt((dof - 2) / dof)
+        return np.expm1(horizon * model['mu'] + model['sigma'] * shocks)
+
+    # Geometric Brownian motion: the horizon log return is normal
+    shocks = rng.standard_normal(size)
+    return np.expm1(horizon * model['mu'] + np.sqrt(horizon) * model['sigma'] * shocks)
+
+def simulated_var(returns, method='filtered_bootstrap', horizon=1, n_scenarios=100_000,
+                  confidence_levels=CONFIDENCE_LEVELS, seed=None, chunk_size=SIMULATION_CHUNK_SIZE):
+    """
+    Calculate Value at Risk and Expected Shortfall by Monte Carlo simulation.
+
+    Scenarios are generated in chunks of ``chunk_size`` paths. Each chunk's
+    paths are reduced to their horizon returns before the next chunk is drawn,
+    so memory holds one chunk of paths plus one return per scenario.
+
+    Parameters:
+    -----------
+    returns : pd.Series or np.ndarray
+        Daily returns without missing values
+    method : str
+        'filtered_bootstrap' resamples EWMA-standardized returns and rescales them
+        by the current volatility; 'bootstrap' resamples returns as they are;
+        'student_t' draws fat-tailed log returns fitted to the mean, volatility
+        and kurtosis; 'gbm' draws normal log returns
+    horizon : int
+        Number of days each scenario covers
+    n_scenarios : int
+        Number of simulated scenarios
+    confidence_levels : sequence of float
+        Confidence levels, e.g. 0.95
+    seed : int, optional
+        Seed of the random generator; the same seed and chunk size give the same result
+    chunk_size : int
+        Number of scenarios simulated at once
+
+    Returns:
+    --------
+    dict
+        Keys like '95% VaR' and '95% Expected Shortfall' mapped to the loss over
+        the horizon as a positive fraction
+    """
+    if method not in SIMULATION_METHODS:
+        raise ValueError(f"Unknown simulation method '{method}'. Choose from {', '.join(SIMULATION_METHODS)}.")
+
+    returns = np.asarray(returns, dtype=np.float64)
+    if method == 'bootstrap':
+        model = {'returns': returns}
+    elif method == 'filtered_bootstrap':
+        volatility, forecast = ewma_volatility(returns)
+        model = {'residuals': returns / volatility, 'sigma': forecast}
+    else:
+        log_returns = np.log1p(returns)
+        model = {'mu': log_returns.mean(), 'sigma': log_returns.std(ddof=1)}
+        if method == 'student_t':
+            model['dof'] = student_t_dof(log_returns)
+
+    rng = np.random.default_rng(seed)
+    outcomes = np.empty(n_scenarios)
+    for start in range(0, n_scenarios, chunk_size):
+        size = min(chunk_size, n_scenarios - start)
+        outcomes[start:start + size] = _simulate_chunk(rng, size, method, horizon, model)
+
+    risk = {}
+    for cl in confidence_levels:
+        threshold = np.percentile(outcomes, (1 - cl) * 100)
+        risk[f'{confidence_label(cl)} VaR'] = -threshold
+        risk[f'{confidence_label(cl)} Expected Shortfall'] = -outcomes[outcomes <= threshold].mean()
+    return risk
+
+class OrderStatisticWindow:
+    """
+    Sliding window of values supporting order statistics in O(log n).
+
+    The values of a series are ranked once up front. Two Fenwick trees over
+    the ranks hold, for the values currently in the window, their count and
+    their sum, so adding or removing a value, finding the k-th smallest value
+    and summing the k smallest values each take O(log n).
+
+    Parameters:
+    -----------
+    values : np.ndarray
+        All values that will pass through the window, without missing values
+    """
+
+    def __init__(self, values):
+        self.values = np.asarray(values, dtype=np.float64)
+        order = np.argsort(self.values, kind='stable')
+        self.sorted_values = self.values[order].tolist()
+        # Fenwick trees are 1-based: position i of the series sits at rank[i]
+        self.rank = np.empty(len(order), dtype=np.int64)
+        self.rank[order] = np.arange(1, len(order) + 1)
+        self.rank = self.rank.tolist()
+        self.size = len(order)
+        self.count_tree = [0] * (self.size + 1)
+        self.sum_tree = [0.0] * (self.size + 1)
+        self.top_bit = 1 << max(self.size.bit_length() - 1, 0)
+        self.count = 0
+
+    def _update(self, position, sign):
+        i = self.rank[position]
+        value = sign * self.values[position]
+        while i <= self.size:
+            self.count_tree[i] += sign
+            self.sum_tree[i] += value
+            i += i & -i
+        self.count += sign
+
+    def add(self, position):
+        """Add the value at ``position`` of the series to the window."""
+        self._update(position, 1)
+
+    def remove(self, position):
+        """Remove the value at ``position`` of the series from the window."""
+        self._update(position, -1)
+
+    def smallest(self, k):
+        """
+        Find the k-th smallest value in the window (1-based).
+
+        Returns:
+        --------
+        tuple
+            (k-th smallest value, sum of the k smallest values)
+        """
+        i = 0
+        total = 0.0
+        bit = self.top_bit
+        while bit:
+            j = i + bit
+            if j <= self.size and self.count_tree[j] < k:
+                i = j
+                k -= self.count_tree[j]
+                total += self.sum_tree[j]
+            bit >>= 1
+        value = self.sorted_values[i]
+        return value, total + value
+
+def rolling_var(returns, window=ROLLING_VAR_WINDOW, confidence_levels=CONFIDENCE_LEVELS):
+    """
+    Calculate rolling historical Value at Risk and Expected Shortfall.
+
+    The window slides one return at a time through an OrderStatisticWindow,
+    so each step costs O(log n) for every confidence level instead of a sort
+    of the whole window. VaR interpolates between order statistics like
+    ``np.percentile``; Expected Shortfall is the mean of the returns at or
+    below the VaR.
+
+    Parameters:
+    -----------
+    returns : pd.Series
+        Daily returns without missing values
+    window : int
+        Number of returns in each window
+    confidence_levels : sequence of float
+        Confidence levels, e.g. 0.95
+
+    Returns:
+    --------
+    pd.DataFrame
+        Columns like '95% VaR' and '95% Expected Shortfall' with the loss as a
+        positive fraction, indexed like ``returns``; NaN until the window is full
+    """
+    values = np.asarray(returns, dtype=np.float64)
+    n = len(values)
+    columns = [name for cl in confidence_levels for name in (f'{confidence_label(cl)} VaR', f'{confidence_label(cl)} Expected Shortfall')]
+    risk = np.full((n, len(columns)), np.nan)
+
+    if 0 < window <= n:
+        # Order statistics each confidence level needs, the same for every window
+        levels = []
+        for cl in confidence_levels:
+            position = (window - 1) * (1 - cl)
+            lower = int(np.floor(position))
+            levels.append((lower + 1, position - lower))
+
+        tree = OrderStatisticWindow(values)
+        for t in range(n):
+            tree.add(t)
+            if t >= window:
+                tree.remove(t - window)
+            if t < window - 1:
+                continue
+
+            row = risk[t]
+            for j, (k, fraction) in enumerate(levels):
+                value, tail_sum = tree.smallest(k)
+                if fraction:
+                    value += fraction * (tree.smallest(k + 1)[0] - value)
+                row[2 * j] = -value
+                row[2 * j + 1] = -tail_sum / k
+
+    index = returns.index if isinstance(returns, pd.Series) else None
+    return pd.DataFrame(risk, index=index, columns=columns)
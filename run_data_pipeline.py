@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+"""
+Command-line data pipeline for the Oil & Gas Market Optimization system.
+This script processes a directory of commodity files, backtests the trading
+strategies and computes risk metrics for each commodity, without importing
+Streamlit or any plotting library.
+
+Usage:
+    python run_data_pipeline.py [--input-dir data/raw] [--output-dir results] [--workers 4]
+
+Each file in the input directory is one commodity, named after the file
+(e.g. data/raw/crude_oil.csv). Processed data is saved to the data store as in
+the web application. The output directory receives the signals of every
+strategy in trading/, plus summary.csv with the strategy metrics and risk.csv
+with the risk metrics of all commodities.
+"""
+
+import os
+import sys
+import glob
+import argparse
+
+import pandas as pd
+
+from batch_processing import run_batch
+from data_pipeline import process_data
+from performance_metrics import performance_metrics
+from risk_analysis import CONFIDENCE_LEVELS, return_statistics, value_at_risk
+from trading_strategies import run_backtest
+
+INPUT_EXTENSIONS = ('.csv', '.xlsx', '.xls')
+
+def find_input_files(input_dir):
+    """Map each commodity to its input file, named after the file."""
+    files = {}
+    for path in sorted(glob.glob(os.path.join(input_dir, '*'))):
+        commodity, ext = os.path.splitext(os.path.basename(path))
+        if ext.lower() in INPUT_EXTENSIONS:
+            files.setdefault(commodity, path)
+    return files
+
+def read_input_file(path):
+    """Read a CSV or Excel file with 'Date' and 'Price' columns into a Date-indexed DataFrame."""
+    if path.lower().endswith('.csv'):
+        df = pd.read_csv(path)
+    else:
+        df = pd.read_excel(path)
+
+    if 'Date' not in df.columns or 'Price' not in df.columns:
+        raise ValueError(f"{path} must have a 'Date' and a 'Price' column.")
+
+    df['Date'] = pd.to_datetime(df['Date'])
+    return df.set_index('Date')
+
+def run_commodity(commodity, input_dir, output_dir, strategies, compact=False):
+    """
+    Process one commodity file and run the strategies and risk metrics on it.
+
+    Parameters:
+    -----------
+    commodity : str
+        Name of the commodity, the stem of its input file
+    input_dir : str
+        Directory with the input files
+    output_dir : str
+        Directory for the strategy signals
+    strategies : dict
+        Strategy name in STRATEGY_KERNELS to its parameters
+    compact : bool
+        Process the data and signals in float32
+
+    Returns:
+    --------
+    dict
+        'rows', 'strategies' (strategy name to metrics) and 'risk' (metric name to value)
+    """
+    df = read_input_file(find_input_files(input_dir)[commodity])
+
+    # Process data
+    df_processed = process_data(df, commodity, compact)
+
+    # Backtest strategies
+    results = {}
+    for name, params in strategies.items():
+        backtest = run_backtest(df_processed, name, compact, **params)
+        backtest.to_frame(compact=compact).to_csv(os.path.join(output_dir, 'trading', f'{commodity}_{name}.csv'))
+        results[name] = performance_metrics(backtest.strategy_returns)
+
+    # Risk metrics
+    returns = df_processed['Price'].pct_change().dropna()
+    risk = return_statistics(returns)
+    risk.update(value_at_risk(returns, CONFIDENCE_LEVELS))
+
+    return {
+        'rows': len(df_processed),
+        'strategies': results,
+        'risk': {name: float(value) for name, value in risk.items()}
+    }
+
+def write_results(outcomes, output_dir):
+    """Write the strategy and risk metrics of all successful commodities."""
+    summary = []
+    risk = []
+    for commodity, outcome in outcomes.items():
+        if outcome['status'] != 'ok':
+            continue
+        for strategy, metrics in outcome['result']['strategies'].items():
+            summary.append({'commodity': commodity, 'strategy': strategy, **metrics})
+        risk.append({'commodity': commodity, **outcome['result']['risk']})
+
+    if summary:
+        pd.DataFrame(summary).to_csv(os.path.join(output_dir, 'summary.csv'), index=False)
+    if risk:
+        pd.DataFrame(risk).to_csv(os.path.join(output_dir, 'risk.csv'), index=False)
+
+def parse_args(argv=None):
+    """Parse the command-line arguments."""
+    parser = argparse.ArgumentParser(description="Process commodity data and run strategies and risk metrics.")
+    parser.add_argument('--input-dir', default='data/raw', help="directory of commodity CSV or Excel files")
+    parser.add_argument('--output-dir', default='results', help="directory for the strategy and risk results")
+    parser.add_argument('--commodities', nargs='+', help="only process these commodities")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="number of worker processes (default: one per commodity, up to the CPU count)")
+    parser.add_argument('--compact', action='store_true', help="process the data in float32")
+    parser.add_argument('--fast-window', type=int, default=10, help="fast moving average window")
+    parser.add_argument('--slow-window', type=int, default=30, help="slow moving average window")
+    parser.add_argument('--rsi-window', type=int, default=14, help="RSI window")
+    parser.add_argument('--oversold', type=int, default=30, help="RSI oversold threshold")
+    parser.add_argument('--overbought', type=int, default=70, help="RSI overbought threshold")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """Run the pipeline and return the exit status."""
+    args = parse_args(argv)
+
+    files = find_input_files(args.input_dir)
+    commodities = args.commodities or list(files)
+    missing = [commodity for commodity in commodities if commodity not in files]
+    if missing:
+        print(f"No input file for: {', '.join(missing)}", file=sys.stderr)
+        return 1
+    if not commodities:
+        print(f"No CSV or Excel files found in {args.input_dir}", file=sys.stderr)
+        return 1
+
+    os.makedirs(os.path.join(args.output_dir, 'trading'), exist_ok=True)
+    strategies = {
+        'ma_crossover': {'fast_window': args.fast_window, 'slow_window': args.slow_window},
+        'rsi': {'window': args.rsi_window, 'oversold': args.oversold, 'overbought': args.overbought}
+    }
+
+    def report_progress(commodity, outcome, n_done, n_total):
+        if outcome['status'] == 'ok':
+            print(f"[{n_done}/{n_total}] {commodity}: {outcome['result']['rows']} rows")
+        else:
+            print(f"[{n_done}/{n_total}] {commodity}: failed ({outcome['error']})", file=sys.stderr)
+
+    outcomes = run_batch(
+        run_commodity, commodities, max_workers=args.workers, progress=report_progress,
+        input_dir=args.input_dir, output_dir=args.output_dir, strategies=strategies, compact=args.compact
+    )
+    write_results(outcomes, args.output_dir)
+
+    failed = [commodity for commodity, outcome in outcomes.items() if outcome['status'] != 'ok']
+    print(f"Processed {len(commodities) - len(failed)} of {len(commodities)} commodities; results in {args.output_dir}")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,192 @@
+"""
+Parameter sweeps for the Oil & Gas Market Optimization system.
+This module backtests whole grids of strategy parameters in batched NumPy passes
+instead of one ``calculate_*_signals`` call per combination.
+"""
+
+import numpy as np
+import pandas as pd
+
+from performance_metrics import batch_metrics
+from trading_strategies import cumulative_sums, price_column, rolling_means, rsi_matrix, rsi_prefix_sums
+
+# Slider ranges on the Trading Dashboard
+MA_FAST_WINDOWS = np.arange(5, 51)
+MA_SLOW_WINDOWS = np.arange(20, 201)
+RSI_WINDOWS = np.arange(5, 31)
+RSI_OVERSOLD_LEVELS = np.arange(10, 41)
+RSI_OVERBOUGHT_LEVELS = np.arange(60, 91)
+
+SWEEP_METRICS = {
+    'sharpe_ratio': 'Sharpe Ratio',
+    'sortino_ratio': 'Sortino Ratio',
+    'calmar_ratio': 'Calmar Ratio',
+    'total_return': 'Total Return',
+    'annualized_return': 'Annualized Return',
+    'volatility': 'Volatility',
+    'max_drawdown': 'Max Drawdown',
+    'win_rate': 'Win Rate',
+}
+
+# Upper bound on the number of float64 cells held per batch (~64 MB)
+MAX_BATCH_CELLS = 8_000_000
+
+
+def _price_array(df):
+    """Extract the price column as a float64 array, using the same rules as the strategies."""
+    if isinstance(df, np.ndarray):
+        return df.astype(np.float64, copy=False)
+    return df[price_column(df)].to_numpy(dtype=np.float64)
+
+
+def sweep_moving_average(df, fast_windows=MA_FAST_WINDOWS, slow_windows=MA_SLOW_WINDOWS):
+    """
+    Backtest every (fast_window, slow_window) pair of the moving average crossover.
+
+    All rolling means come from a single cumulative-sum table. The pairs are
+    evaluated in blocks of fast and slow windows, and each block computes only
+    its own rolling means, so memory stays within MAX_BATCH_CELLS however long
+    the price history is.
+
+    Parameters:
+    -----------
+    df : pd.DataFrame or np.ndarray
+        Processed data for one commodity, or its price array
+    fast_windows : array-like
+        Fast moving average windows
+    slow_windows : array-like
+        Slow moving average windows
+
+    Returns:
+    --------
+    dict
+        'fast_windows' and 'slow_windows' axes plus one
+        (len(fast_windows), len(slow_windows)) matrix per metric. 'axes' lists
+        the axis names in dimension order.
+    """
+    prices = _price_array(df)
+    fast_windows = np.asarray(fast_windows)
+    slow_windows = np.asarray(slow_windows)
+    n = len(prices)
+    if n < 3:
+        raise ValueError("At least 3 prices are needed for a sweep")
+
+    sums = cumulative_sums(prices)
+    returns = prices[1:] / prices[:-1] - 1
+
+    results = {name: np.empty((len(fast_windows), len(slow_windows))) for name in SWEEP_METRICS}
+    slow_batch = max(1, min(len(slow_windows), MAX_BATCH_CELLS // n))
+    fast_batch = max(1, MAX_BATCH_CELLS // (slow_batch * n))
+
+    for k in range(0, len(slow_windows), slow_batch):
+        slow = rolling_means(prices, slow_windows[k:k + slow_batch], sums)[None, :, :-1]
+
+        for i in range(0, len(fast_windows), fast_batch):
+            fast = rolling_means(prices, fast_windows[i:i + fast_batch], sums)[:, None, :-1]
+
+            # Signal held over the next period, as in signal.shift(1) * returns
+            signal = (fast > slow).astype(np.int8) - (fast < slow).astype(np.int8)
+            strategy_returns = signal * returns
+
+            metrics = batch_metrics(strategy_returns.reshape(-1, n - 1), n_periods_total=n)
+            for name, values in metrics.items():
+                results[name][i:i + fast_batch, k:k + slow_batch] = values.reshape(-1, slow.shape[1])
+
+    results['fast_windows'] = fast_windows
+    results['slow_windows'] = slow_windows
+    results['axes'] = ('fast_windows', 'slow_windows')
+    return results
+
+
+def sweep_rsi(df, windows=RSI_WINDOWS, oversold_levels=RSI_OVERSOLD_LEVELS,
+              overbought_levels=RSI_OVERBOUGHT_LEVELS):
+    """
+    Backtest every (window, oversold, overbought) combination of the RSI strategy.
+
+    The gains and losses are computed once, and the RSI of every window comes
+    from their shared prefix sums. The windows are processed in batches so
+    that memory stays within MAX_BATCH_CELLS, and every threshold pair is
+    evaluated by broadcasting against the RSI of a window.
+
+    Parameters:
+    -----------
+    df : pd.DataFrame or np.ndarray
+        Processed data for one commodity, or its price array
+    windows : array-like
+        RSI windows
+    oversold_levels : array-like
+        Buy thresholds
+    overbought_levels : array-like
+        Sell thresholds
+
+    Returns:
+    --------
+    dict
+        'windows', 'oversold_levels' and 'overbought_levels' axes plus one
+        (len(windows), len(oversold_levels), len(overbought_levels)) array per
+        metric. 'axes' lists the axis names in dimension order.
+    """
+    prices = _price_array(df)
+    windows = np.asarray(windows)
+    oversold_levels = np.asarray(oversold_levels)
+    overbought_levels = np.asarray(overbought_levels)
+    n = len(prices)
+    if n < 3:
+        raise ValueError("At least 3 prices are needed for a sweep")
+
+    returns = prices[1:] / prices[:-1] - 1
+
+    shape = (len(windows), len(oversold_levels), len(overbought_levels))
+    results = {name: np.empty(shape) for name in SWEEP_METRICS}
+
+    sums = rsi_prefix_sums(prices)
+    window_batch = max(1, MAX_BATCH_CELLS // n)
+    batch = max(1, MAX_BATCH_CELLS // (len(overbought_levels) * n))
+
+    for k in range(0, len(windows), window_batch):
+        rsi_batch = rsi_matrix(prices, windows[k:k + window_batch], sums)[:, :-1]
+
+        for i, rsi in enumerate(rsi_batch, start=k):
+            # Buy when oversold, sell when overbought
+            buy = (rsi[None, :] < oversold_levels[:, None]).astype(np.int8)
+            sell = (rsi[None, :] > overbought_levels[:, None]).astype(np.int8)
+
+            for j in range(0, len(oversold_levels), batch):
+                signal = buy[j:j + batch, None, :] - sell[None, :, :]
+                strategy_returns = signal * returns
+
+                metrics = batch_metrics(strategy_returns.reshape(-1, n - 1), n_periods_total=n)
+                for name, values in metrics.items():
+                    results[name][i, j:j + batch] = values.reshape(-1, len(overbought_levels))
+
+    results['windows'] = windows
+    results['oversold_levels'] = oversold_levels
+    results['overbought_levels'] = overbought_levels
+    results['axes'] = ('windows', 'oversold_levels', 'overbought_levels')
+    return results
+
+
+def sweep_to_frame(sweep, metric, row_axis=None, col_axis=None):
+    """Turn one metric of a 2-D sweep into a labelled DataFrame for display."""
+    row_axis = row_axis or sweep['axes'][0]
+    col_axis = col_axis or sweep['axes'][1]
+    return pd.DataFrame(
+        sweep[metric],
+        index=pd.Index(sweep[row_axis], name=row_axis),
+        columns=pd.Index(sweep[col_axis], name=col_axis)
+    )
+
+
+def sweep_to_series(sweep, metric):
+    """Turn one metric of a sweep of any dimension into a Series labelled by its parameters."""
+    index = pd.MultiIndex.from_product(
+        [sweep[axis] for axis in sweep['axes']], names=list(sweep['axes'])
+    )
+    return pd.Series(sweep[metric].ravel(), index=index, name=metric)
+
+
+def best_parameters(sweep, metric='sharpe_ratio'):
+    """Return the parameter values with the highest value of a metric."""
+    values = np.where(np.isnan(sweep[metric]), -np.inf, sweep[metric])
+    idx = np.unravel_index(np.argmax(values), values.shape)
+    return {axis: sweep[axis][i].item() for axis, i in zip(sweep['axes'], idx)}
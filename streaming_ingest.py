@@ -0,0 +1,169 @@
+"""
+Streaming ingestion for the Oil & Gas Market Optimization system.
+This module processes large CSV files in chunks, so peak memory is bounded by the
+chunk size instead of the file size.
+
+The file is read twice. The first pass estimates the IQR outlier bounds of every
+numeric column with a streaming quantile sketch. The second pass forward-fills,
+clips and adds features chunk by chunk, carrying the rolling-window tail and EMA
+state from one chunk to the next, and writes each processed chunk as it goes.
+"""
+
+import numpy as np
+import pandas as pd
+
+from data_pipeline import add_features, clean_data, continue_processing, feature_state
+from data_storage import ProcessedWriter, save_feature_state
+
+DEFAULT_CHUNKSIZE = 100_000
+
+
+class QuantileSketch:
+    """
+    Streaming quantile estimator with bounded memory.
+
+    Values are kept in levels of compactors: when a level holds more than ``k``
+    values it is sorted and every other value is promoted to the next level with
+    twice the weight. Updates are vectorized per chunk and memory grows only
+    with log(n / k). The rank error is a small fraction of a percent for the
+    default ``k``, and quantiles are exact while fewer than ``k`` values have
+    been seen.
+
+    Parameters:
+    -----------
+    k : int
+        Capacity of each level
+    seed : int
+        Seed for the compaction offsets, for reproducible estimates
+    """
+
+    def __init__(self, k=4096, seed=0):
+        self.k = k
+        self.count = 0
+        self._levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, values):
+        """Add an array of values, ignoring NaNs."""
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        self.count += len(values)
+        self._levels[0] = np.concatenate((self._levels[0], values))
+        self._compact()
+
+    def _compact(self):
+        h = 0
+        while h < len(self._levels):
+            level = self._levels[h]
+            if len(level) > self.k:
+                level = np.sort(level)
+                # An odd value out stays at this level
+                keep = level[len(level) - len(level) % 2:]
+                promoted = level[self._rng.integers(2):len(level) - len(keep):2]
+                self._levels[h] = keep
+                if h + 1 == len(self._levels):
+                    self._levels.append(np.empty(0))
+                self._levels[h + 1] = np.concatenate((self._levels[h + 1], promoted))
+            h += 1
+
+    def quantile(self, q):
+        """Estimate the q-th quantile, or NaN if no values have been seen."""
+        if self.count == 0:
+            return np.nan
+        if len(self._levels) == 1:
+            return float(np.quantile(self._levels[0], q))
+
+        values = np.concatenate(self._levels)
+        weights = np.concatenate([np.full(len(level), 2.0 ** h) for h, level in enumerate(self._levels)])
+        order = np.argsort(values)
+        values = values[order]
+        weights = weights[order]
+
+        # Place each value at the midpoint of the rank range it represents
+        cum = np.cumsum(weights)
+        positions = (cum - weights / 2) / cum[-1]
+        return float(np.interp(q, positions, values))
+
+
+def _read_chunks(source, chunksize):
+    """Read a CSV source in chunks with a Date index."""
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    for chunk in pd.read_csv(source, chunksize=chunksize):
+        chunk['Date'] = pd.to_datetime(chunk['Date'])
+        yield chunk.set_index('Date')
+
+
+def estimate_bounds(source, chunksize=DEFAULT_CHUNKSIZE, k=4096):
+    """
+    Estimate the IQR outlier bounds of every numeric column in one streaming pass.
+
+    Returns:
+    --------
+    dict
+        Column name to (lower_bound, upper_bound), as in iqr_bounds
+    """
+    sketches = {}
+    for chunk in _read_chunks(source, chunksize):
+        for col in chunk.select_dtypes(include=['number']).columns:
+            sketches.setdefault(col, QuantileSketch(k)).update(chunk[col].to_numpy())
+
+    bounds = {}
+    for col, sketch in sketches.items():
+        Q1 = sketch.quantile(0.25)
+        Q3 = sketch.quantile(0.75)
+        IQR = Q3 - Q1
+        bounds[col] = (Q1 - 1.5 * IQR, Q3 + 1.5 * IQR)
+    return bounds
+
+
+def ingest_csv(source, commodity, chunksize=DEFAULT_CHUNKSIZE, fmt=None, progress=None, compact=False):
+    """
+    Clean, add features to and save a large CSV file chunk by chunk.
+
+    Parameters:
+    -----------
+    source : str or file-like
+        Path or seekable file object of a CSV file with 'Date' and 'Price' columns,
+        sorted by date
+    commodity : str
+        Name of the commodity
+    chunksize : int
+        Number of rows per chunk
+    fmt : str, optional
+        Storage format of the processed file
+    progress : callable, optional
+        Called with the number of rows processed so far after each chunk
+    compact : bool
+        Process and store the data in float32
+
+    Returns:
+    --------
+    dict
+        Summary with the number of rows written and the outlier bounds used
+    """
+    # First pass: outlier bounds
+    bounds = estimate_bounds(source, chunksize)
+
+    # Second pass: clean, add features and write chunk by chunk
+    state = None
+    with ProcessedWriter(commodity, fmt) as writer:
+        for chunk in _read_chunks(source, chunksize):
+            if 'Price' not in chunk.columns:
+                raise ValueError("The file must have a 'Price' column.")
+
+            if state is None:
+                df_cleaned = clean_data(chunk, bounds, compact)
+                df_features = add_features(df_cleaned, compact)
+                state = feature_state(df_cleaned, df_features, bounds)
+            else:
+                df_features, state = continue_processing(chunk, state, compact)
+
+            writer.write(df_features)
+            if progress is not None:
+                progress(writer.rows)
+
+    if state is not None:
+        save_feature_state(state, commodity)
+
+    return {'rows': writer.rows, 'bounds': bounds}
@@ -0,0 +1,18 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from batch_processing import generate_and_process, run_batch
+from data_pipeline import generate_sample_data
+
+
+def test_sample_data_is_the_same_in_worker_processes(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    outcomes = run_batch(generate_and_process, ['crude_oil', 'diesel'], max_workers=2)
+    assert all(outcome['status'] == 'ok' for outcome in outcomes.values())
+
+    for commodity in ('crude_oil', 'diesel'):
+        raw = pd.read_csv(os.path.join('data', 'raw', f'{commodity}.csv'), index_col='Date', parse_dates=True)
+        expected = generate_sample_data(commodity)
+        np.testing.assert_allclose(raw['Price'].to_numpy(), expected['Price'].to_numpy(), rtol=1e-12)
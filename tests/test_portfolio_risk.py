@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import portfolio_risk
+from portfolio_risk import MAX_ESTIMATORS, covariance_estimator, estimate_covariance
+
+
+@pytest.fixture
+def returns():
+    rng = np.random.default_rng(0)
+    index = pd.date_range('2020-01-01', periods=400, freq='D')
+    return pd.DataFrame(rng.normal(0, 0.01, (400, 4)), index=index, columns=['a', 'b', 'c', 'd'])
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    portfolio_risk._estimators.clear()
+    yield
+    portfolio_risk._estimators.clear()
+
+
+@pytest.mark.parametrize('method', ['shrinkage', 'sample', 'ewma'])
+def test_appended_rows_match_a_full_fit(returns, method):
+    estimate_covariance(returns.iloc[:300], method)
+    incremental = estimate_covariance(returns, method)
+    full = covariance_estimator(method).fit(returns).covariance()
+    np.testing.assert_allclose(incremental, full, rtol=1e-10)
+
+
+def test_changed_history_is_refitted(returns):
+    estimate_covariance(returns, 'sample')
+    np.testing.assert_allclose(
+        estimate_covariance(returns * 2, 'sample'),
+        4 * covariance_estimator('sample').fit(returns).covariance(),
+        rtol=1e-10
+    )
+
+
+def test_cached_estimators_are_bounded(returns):
+    for i in range(MAX_ESTIMATORS + 5):
+        estimate_covariance(returns.rename(columns={'a': f'a{i}'}), 'sample')
+    assert len(portfolio_risk._estimators) == MAX_ESTIMATORS
@@ -0,0 +1,61 @@
+import pytest
+
+from qa_component import QA_DATABASE
+from qa_index import QAIndex
+
+# Queries the original word-overlap matcher answered correctly, with its match
+BASELINE_MATCHES = {
+    "how to deploy on cloud": "can i run this system on a cloud server",
+    "how do I get started": "how do i start",
+    "where are the docs": "where can i find documentation",
+    "how much data do I need": "how much historical data is recommended",
+    "what format should my data be in": "what data format is required",
+    "can I use my own data": "can i use data from different sources",
+    "what is the best strategy": "which strategy performs best",
+    "how do I read the backtest results": "how do i interpret the backtest results",
+    "how often to reoptimize": "how often should i reoptimize strategy parameters",
+    "explain value at risk": "what is value at risk",
+    "what are monte carlo simulations": "how are monte carlo simulations used",
+    "how to use risk metrics": "how should i use the risk metrics",
+    "module not found error": "why am i getting a no module found error",
+    "no module named streamlit": "why am i getting a no module found error",
+    "how to make processing faster": "how can i speed up the data processing",
+    "speed up data processing": "how can i speed up the data processing",
+    "can I run it on AWS": "can i run this system on a cloud server",
+    "what does this system do": "what is this system",
+    "how do I begin": "how do i start",
+    "where is the documentation": "where can i find documentation",
+    "how do I update": "how do i update the system",
+    "how to upgrade the system": "how do i update the system",
+    "sample data generation": "how does the sample data generation work",
+    "how is sample data generated": "how does the sample data generation work",
+    "how much history is needed": "how much historical data is recommended",
+    "data from other sources": "can i use data from different sources",
+    "what is this": "what is this system",
+    "start": "how do i start",
+    "risk": "what is value at risk",
+    "documentation": "where can i find documentation",
+    "how many years of data for risk analysis": "how much historical data is recommended",
+    "Can I create custom strategies?": "can i create custom strategies",
+}
+
+
+@pytest.fixture(scope='module')
+def index():
+    return QAIndex(QA_DATABASE)
+
+
+@pytest.mark.parametrize('query, expected', BASELINE_MATCHES.items())
+def test_matches_at_least_the_baseline(index, query, expected):
+    assert index.best_match(query)[0] == expected
+
+
+@pytest.mark.parametrize('query', ["who won the football game", "recipe for pancakes"])
+def test_unrelated_query_has_no_match(index, query):
+    assert index.best_match(query) == (None, None, 0)
+
+
+def test_unknown_words_lower_the_score(index):
+    _, _, focused = index.best_match("monte carlo simulations")
+    _, _, diluted = index.best_match("monte carlo simulations for quarterly hedging budgets")
+    assert diluted < focused
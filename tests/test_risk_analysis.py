@@ -0,0 +1,11 @@
+import numpy as np
+import pandas as pd
+
+from risk_analysis import rolling_var
+
+
+def test_rolling_var_labels_keep_fractional_levels():
+    returns = pd.Series(np.random.default_rng(0).normal(0, 0.01, 300))
+    risk = rolling_var(returns, window=100, confidence_levels=(0.95, 0.975))
+    assert list(risk.columns) == ['95% VaR', '95% Expected Shortfall', '97.5% VaR', '97.5% Expected Shortfall']
+    assert risk['97.5% VaR'].iloc[-1] > risk['95% VaR'].iloc[-1]
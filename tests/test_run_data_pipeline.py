@@ -0,0 +1,35 @@
+import os
+import sys
+import subprocess
+
+import pandas as pd
+
+from data_pipeline import generate_sample_data
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_cli_processes_generated_data(tmp_path):
+    raw_dir = tmp_path / 'raw'
+    raw_dir.mkdir()
+    for commodity in ('crude_oil', 'diesel'):
+        df = generate_sample_data(commodity, end_date='2020-06-30')
+        # A gap the cleaning step has to fill
+        df.iloc[5:8, df.columns.get_loc('Price')] = float('nan')
+        df.to_csv(raw_dir / f'{commodity}.csv')
+
+    completed = subprocess.run(
+        [sys.executable, os.path.join(ROOT, 'run_data_pipeline.py'),
+         '--input-dir', str(raw_dir), '--output-dir', str(tmp_path / 'results'), '--workers', '1'],
+        cwd=tmp_path, capture_output=True, text=True
+    )
+    assert completed.returncode == 0, completed.stderr
+
+    summary = pd.read_csv(tmp_path / 'results' / 'summary.csv')
+    assert sorted(summary['commodity'].unique()) == ['crude_oil', 'diesel']
+    assert set(summary['strategy']) == {'ma_crossover', 'rsi'}
+    risk = pd.read_csv(tmp_path / 'results' / 'risk.csv')
+    assert len(risk) == 2
+
+    signals = pd.read_csv(tmp_path / 'results' / 'trading' / 'crude_oil_rsi.csv')
+    assert signals['Price'].notna().all()
@@ -0,0 +1,34 @@
+import numpy as np
+
+from data_pipeline import generate_sample_data
+from performance_metrics import performance_metrics
+from strategy_sweep import SWEEP_METRICS, sweep_moving_average, sweep_rsi
+from trading_strategies import run_backtest
+
+
+def _prices():
+    return generate_sample_data('crude_oil', end_date='2021-06-30')[['Price']]
+
+
+def _assert_cell(sweep, index, df, strategy, **params):
+    expected = performance_metrics(run_backtest(df, strategy, **params).strategy_returns)
+    for name in SWEEP_METRICS:
+        np.testing.assert_allclose(sweep[name][index], expected[name], rtol=1e-9, atol=1e-12, err_msg=name)
+
+
+def test_moving_average_sweep_matches_backtest():
+    df = _prices()
+    sweep = sweep_moving_average(df, fast_windows=[5, 12], slow_windows=[20, 45])
+    for i, fast in enumerate(sweep['fast_windows']):
+        for j, slow in enumerate(sweep['slow_windows']):
+            _assert_cell(sweep, (i, j), df, 'ma_crossover', fast_window=int(fast), slow_window=int(slow))
+
+
+def test_rsi_sweep_matches_backtest():
+    df = _prices()
+    sweep = sweep_rsi(df, windows=[7, 14], oversold_levels=[25, 30], overbought_levels=[70, 80])
+    for i, window in enumerate(sweep['windows']):
+        for j, oversold in enumerate(sweep['oversold_levels']):
+            for k, overbought in enumerate(sweep['overbought_levels']):
+                _assert_cell(sweep, (i, j, k), df, 'rsi', window=int(window),
+                             oversold=int(oversold), overbought=int(overbought))
@@ -0,0 +1,309 @@
+"""
+Trading strategies for the Oil & Gas Market Optimization system.
+This module computes strategy signals and performance metrics without depending on Streamlit.
+
+Strategies run on NumPy arrays. A strategy is a kernel that maps a price array and
+its parameters to a -1/0/1 signal array plus any indicator arrays worth plotting;
+``run_backtest`` turns the signal into returns and equity curves. The input frame
+is never copied, and a DataFrame is only built by ``BacktestResult.to_frame`` for
+display. New strategies plug in by adding a kernel to ``STRATEGY_KERNELS``.
+"""
+
+import numpy as np
+import pandas as pd
+
+from data_pipeline import compact_dtypes
+from performance_metrics import format_metrics, performance_metrics
+
+def price_column(df):
+    """Determine the price column of a DataFrame: 'Price', then 'close', then the first numeric column."""
+    price_col = 'Price' if 'Price' in df.columns else 'close'
+    if price_col not in df.columns:
+        # Try to find a suitable price column
+        numeric_cols = df.select_dtypes(include=['number']).columns
+        if len(numeric_cols) > 0:
+            price_col = numeric_cols[0]
+        else:
+            raise ValueError("No suitable price column found in data")
+    return price_col
+
+def cumulative_sums(values):
+    """
+    Prefix sums and counts of the non-missing values along the first axis.
+    
+    The sums are accumulated in float64 even for float32 values, so that long
+    histories keep their precision.
+    
+    Returns:
+    --------
+    tuple
+        (sums, counts), each with a leading zero row. counts is None when no
+        value is missing.
+    """
+    missing = np.isnan(values)
+    zeros = np.zeros((1,) + values.shape[1:])
+    if not missing.any():
+        return np.concatenate((zeros, np.cumsum(values, axis=0, dtype=np.float64))), None
+    sums = np.concatenate((zeros, np.cumsum(np.where(missing, 0.0, values), axis=0, dtype=np.float64)))
+    counts = np.concatenate((zeros, np.cumsum(~missing, axis=0)))
+    return sums, counts
+
+def rolling_means(values, windows, sums=None):
+    """
+    Compute rolling means along the first axis for several windows at once.
+    
+    Works on a 1-D series or a 2-D (dates, series) matrix. A window containing
+    a missing value is incomplete, as in pandas' rolling mean.
+    
+    Parameters:
+    -----------
+    values : np.ndarray
+        1-D or 2-D array
+    windows : array-like
+        Window lengths
+    sums : tuple, optional
+        ``cumulative_sums(values)``, so that callers computing the means in
+        batches of windows share one table
+        
+    Returns:
+    --------
+    np.ndarray
+        Array of shape ``(len(windows),) + values.shape`` in the dtype of
+        ``values``, NaN where a window is incomplete
+    """
+    windows = np.asarray(windows, dtype=np.int64)
+    csum, ccount = cumulative_sums(values) if sums is None else sums
+    # Windows broadcast against the (window, date, series...) result
+    window_lengths = windows.reshape((-1, 1) + (1,) * (values.ndim - 1))
+    
+    end = np.arange(1, len(values) + 1)
+    start = end[None, :] - windows[:, None]
+    complete = (start >= 0).reshape(start.shape + (1,) * (values.ndim - 1))
+    start = np.maximum(start, 0)
+    if ccount is not None:
+        complete = complete & ((ccount[end][None] - ccount[start]) == window_lengths)
+    
+    with np.errstate(invalid='ignore'):
+        means = (csum[end][None] - csum[start]) / window_lengths
+    return np.where(complete, means, np.nan).astype(values.dtype, copy=False)
+
+def rolling_mean(values, window):
+    """Rolling mean of one window along the first axis, in the shape and dtype of ``values``."""
+    return rolling_means(values, [window])[0]
+
+def rsi_prefix_sums(prices):
+    """
+    Compute the price changes and the gain and loss prefix sums every RSI window is built from.
+    
+    Returns:
+    --------
+    tuple
+        (price changes, gain sums, loss sums, rounding tolerance per series)
+    """
+    delta = np.diff(prices, axis=0)
+    # np.maximum keeps missing changes missing and keeps the dtype of the prices
+    gain_sums = cumulative_sums(np.maximum(delta, 0))
+    loss_sums = cumulative_sums(np.maximum(-delta, 0))
+    
+    # Differences of prefix sums leave rounding noise where the exact average is zero
+    valid = ~np.isnan(delta)
+    mean_move = np.where(valid, np.abs(delta), 0.0).sum(axis=0) / np.maximum(valid.sum(axis=0), 1)
+    return delta, gain_sums, loss_sums, 1e-9 * mean_move
+
+def rsi_matrix(prices, windows, sums=None):
+    """
+    Compute the RSI along the first axis for several windows from shared gain/loss prefix sums.
+    
+    Parameters:
+    -----------
+    prices : np.ndarray
+        1-D price series or 2-D (dates, series) price matrix
+    windows : array-like
+        RSI windows
+    sums : tuple, optional
+        ``rsi_prefix_sums(prices)``, so that callers computing the RSI in
+        batches of windows share one set of prefix sums
+    
+    Returns:
+    --------
+    np.ndarray
+        Array of shape ``(len(windows),) + prices.shape`` in the dtype of
+        ``prices``, NaN where the RSI is undefined
+    """
+    delta, gain_sums, loss_sums, tol = rsi_prefix_sums(prices) if sums is None else sums
+    
+    avg_gain = rolling_means(delta, windows, gain_sums)
+    avg_loss = rolling_means(delta, windows, loss_sums)
+    avg_gain[np.abs(avg_gain) < tol] = 0.0
+    avg_loss[np.abs(avg_loss) < tol] = 0.0
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi = 100 - 100 / (1 + avg_gain / avg_loss)
+    
+    # The first price has no change, so every window starts one period later
+    first = np.full((len(rsi), 1) + prices.shape[1:], np.nan, dtype=rsi.dtype)
+    return np.concatenate((first, rsi), axis=1)
+
+def relative_strength_index(prices, window):
+    """RSI of one window along the first axis, in the shape and dtype of ``prices``."""
+    return rsi_matrix(prices, [window])[0]
+
+def moving_average_kernel(prices, fast_window=10, slow_window=30):
+    """Long when the fast moving average is above the slow one, short when below."""
+    fast_ma = rolling_mean(prices, fast_window)
+    slow_ma = rolling_mean(prices, slow_window)
+    signal = (fast_ma > slow_ma).astype(np.int8) - (fast_ma < slow_ma).astype(np.int8)
+    return signal, {'fast_ma': fast_ma, 'slow_ma': slow_ma}
+
+def rsi_kernel(prices, window=14, oversold=30, overbought=70):
+    """Buy when the RSI is oversold and sell when it is overbought."""
+    rsi = relative_strength_index(prices, window)
+    signal = np.where(rsi > overbought, -1, np.where(rsi < oversold, 1, 0)).astype(np.int8)
+    return signal, {'rsi': rsi}
+
+# Strategy name to kernel: kernel(prices, **params) -> (signal, indicators). Kernels
+# work along the first axis, so they accept a price series or a (dates, commodities) matrix.
+STRATEGY_KERNELS = {
+    'ma_crossover': moving_average_kernel,
+    'rsi': rsi_kernel,
+}
+
+def _cumulative(returns):
+    """Cumulative returns that skip missing values like pandas' cumprod, in the dtype of the returns."""
+    missing = np.isnan(returns)
+    growth = np.cumprod(np.where(missing, 1.0, 1 + returns), axis=0, dtype=np.float64)
+    cumulative = (growth - 1).astype(returns.dtype, copy=False)
+    cumulative[missing] = np.nan
+    return cumulative
+
+class BacktestResult:
+    """
+    Arrays produced by a backtest, aligned with the input index.
+    
+    The arrays are 1-D for a single price series and (dates, series) for a
+    price matrix. Prices, indicators and returns share the dtype of the
+    prices: float64, or float32 for a compact backtest.
+    
+    Attributes:
+    -----------
+    index : pd.Index
+        Index of the input data
+    price_col : str
+        Name of the price column
+    prices : np.ndarray
+        Prices, a view of the input column where it already has the backtest dtype
+    signal : np.ndarray
+        int8 position held after each period: 1 long, -1 short, 0 flat
+    indicators : dict
+        Indicator name to array, e.g. 'fast_ma' and 'slow_ma'
+    returns : np.ndarray
+        Price returns, NaN for the first period
+    strategy_returns : np.ndarray
+        Returns of the strategy, using the signal of the previous period
+    """
+    
+    def __init__(self, index, price_col, prices, signal, indicators):
+        self.index = index
+        self.price_col = price_col
+        self.prices = prices
+        self.signal = signal
+        self.indicators = indicators
+        
+        self.returns = np.empty(prices.shape, dtype=prices.dtype)
+        self.returns[0] = np.nan
+        np.divide(prices[1:], prices[:-1], out=self.returns[1:])
+        self.returns[1:] -= 1
+        
+        self.strategy_returns = np.full(prices.shape, np.nan, dtype=prices.dtype)
+        self.strategy_returns[1:] = signal[:-1] * self.returns[1:]
+    
+    @property
+    def position_change(self):
+        """Change of the signal from the previous period, NaN for the first period."""
+        change = np.empty(self.signal.shape, dtype=self.prices.dtype)
+        change[0] = np.nan
+        change[1:] = np.diff(self.signal.astype(self.prices.dtype), axis=0)
+        return change
+    
+    @property
+    def cumulative_returns(self):
+        """Buy-and-hold equity curve as cumulative returns."""
+        return _cumulative(self.returns)
+    
+    @property
+    def strategy_cumulative_returns(self):
+        """Strategy equity curve as cumulative returns."""
+        return _cumulative(self.strategy_returns)
+    
+    def to_frame(self, df=None, compact=False):
+        """
+        Build a DataFrame of the results for display or export.
+        
+        Parameters:
+        -----------
+        df : pd.DataFrame, optional
+            Input data whose columns are included in front of the results
+        compact : bool
+            Use float32 values and int8 signals, also for the columns of ``df``
+        """
+        columns = dict(self.indicators)
+        columns.update({
+            'signal': self.signal,
+            'position_change': self.position_change,
+            'returns': self.returns,
+            'strategy_returns': self.strategy_returns,
+            'cumulative_returns': self.cumulative_returns,
+            'strategy_cumulative_returns': self.strategy_cumulative_returns,
+        })
+        if df is None:
+            data = pd.DataFrame({self.price_col: self.prices, **columns}, index=self.index)
+        else:
+            data = df.assign(**columns)
+        
+        # Use float32 values and int8 signals in compact mode
+        if compact:
+            compact_dtypes(data, int8_columns=['signal', 'position_change'])
+        
+        return data
+
+def run_backtest(df, strategy, compact=False, **params):
+    """
+    Backtest a strategy on the price column of a DataFrame.
+    
+    Parameters:
+    -----------
+    df : pd.DataFrame
+        Processed data for one commodity
+    strategy : str or callable
+        Name in STRATEGY_KERNELS or a kernel function
+    compact : bool
+        Run the kernels and hold every result array in float32, with int8
+        signals. Running sums and compounding are still accumulated in float64.
+    **params
+        Strategy parameters passed to the kernel
+        
+    Returns:
+    --------
+    BacktestResult
+        Signals, indicators, returns and equity curves as arrays
+    """
+    kernel = STRATEGY_KERNELS[strategy] if isinstance(strategy, str) else strategy
+    price_col = price_column(df)
+    dtype = np.float32 if compact else np.float64
+    prices = np.ascontiguousarray(df[price_col].to_numpy(dtype=dtype))
+    signal, indicators = kernel(prices, **params)
+    return BacktestResult(df.index, price_col, prices, signal, indicators)
+
+def calculate_moving_average_signals(df, fast_window=10, slow_window=30, compact=False):
+    """Calculate moving average crossover signals."""
+    result = run_backtest(df, 'ma_crossover', compact, fast_window=fast_window, slow_window=slow_window)
+    return result.to_frame(df, compact)
+
+def calculate_rsi_signals(df, window=14, oversold=30, overbought=70, compact=False):
+    """Calculate RSI signals."""
+    result = run_backtest(df, 'rsi', compact, window=window, oversold=oversold, overbought=overbought)
+    return result.to_frame(df, compact)
+
+def calculate_performance_metrics(returns):
+    """Calculate performance metrics, formatted for display."""
+    return format_metrics(performance_metrics(returns))
@@ -0,0 +1,239 @@
+"""
+Walk-forward optimization for the Oil & Gas Market Optimization system.
+This module re-optimizes strategy parameters on rolling in-sample windows and
+evaluates each choice on the out-of-sample period that follows it, as a trader
+re-optimizing every quarter would have done.
+
+Each fold sweeps the full parameter grid on its in-sample window and trades the
+best parameters over the next out-of-sample window. Folds are independent, so
+they run on a process pool. The price array is placed in shared memory once and
+mapped read-only by every worker instead of being pickled for each fold.
+"""
+
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from performance_metrics import batch_metrics, performance_metrics
+from strategy_sweep import (
+    MA_FAST_WINDOWS, MA_SLOW_WINDOWS, RSI_OVERBOUGHT_LEVELS, RSI_OVERSOLD_LEVELS, RSI_WINDOWS,
+    SWEEP_METRICS, best_parameters, sweep_moving_average, sweep_rsi
+)
+from trading_strategies import STRATEGY_KERNELS, price_column
+
+# Two years of daily data to optimize on, re-optimized every quarter
+IN_SAMPLE_PERIODS = 504
+OUT_OF_SAMPLE_PERIODS = 63
+
+# Strategy name to (sweep function, parameter grid), as keyword arguments of the sweep
+SWEEPS = {
+    'ma_crossover': (sweep_moving_average, {'fast_windows': MA_FAST_WINDOWS, 'slow_windows': MA_SLOW_WINDOWS}),
+    'rsi': (sweep_rsi, {
+        'windows': RSI_WINDOWS,
+        'oversold_levels': RSI_OVERSOLD_LEVELS,
+        'overbought_levels': RSI_OVERBOUGHT_LEVELS,
+    }),
+}
+
+# Sweep axis names to the keyword arguments of the strategy kernels
+KERNEL_PARAMETERS = {
+    'fast_windows': 'fast_window',
+    'slow_windows': 'slow_window',
+    'windows': 'window',
+    'oversold_levels': 'oversold',
+    'overbought_levels': 'overbought',
+}
+
+# Prices mapped from shared memory in a worker process
+_shared = {}
+
+
+def fold_bounds(n, in_sample=IN_SAMPLE_PERIODS, out_of_sample=OUT_OF_SAMPLE_PERIODS):
+    """
+    Split n periods into walk-forward folds.
+
+    Returns:
+    --------
+    list
+        (in_sample_start, out_of_sample_start, out_of_sample_end) positions; the
+        out-of-sample windows follow each other without gaps or overlap
+    """
+    folds = []
+    for oos_start in range(in_sample, n, out_of_sample):
+        folds.append((oos_start - in_sample, oos_start, min(oos_start + out_of_sample, n)))
+    return folds
+
+
+def run_fold(prices, bounds, strategy, metric='sharpe_ratio'):
+    """
+    Optimize on one in-sample window and trade the result out of sample.
+
+    Parameters:
+    -----------
+    prices : np.ndarray
+        Full price array
+    bounds : tuple
+        (in_sample_start, out_of_sample_start, out_of_sample_end) positions
+    strategy : str
+        Name in SWEEPS
+    metric : str
+        Metric to maximize, a key of SWEEP_METRICS
+
+    Returns:
+    --------
+    dict
+        'params' (kernel keyword arguments), 'in_sample_metric' and
+        'returns' (out-of-sample strategy returns)
+    """
+    is_start, oos_start, oos_end = bounds
+    sweep_function, grid = SWEEPS[strategy]
+
+    # In-sample: best parameters of the full grid
+    sweep = sweep_function(prices[is_start:oos_start], **grid)
+    best = best_parameters(sweep, metric)
+    position = tuple(int(np.flatnonzero(sweep[axis] == value)[0]) for axis, value in best.items())
+    params = {KERNEL_PARAMETERS[axis]: value for axis, value in best.items()}
+
+    # Out of sample: indicators are warmed up on the in-sample window, and the
+    # first out-of-sample return uses the signal of the last in-sample period
+    window = prices[is_start:oos_end]
+    signal, _ = STRATEGY_KERNELS[strategy](window, **params)
+    returns = window[1:] / window[:-1] - 1
+    strategy_returns = signal[:-1] * returns
+
+    return {
+        'params': params,
+        'in_sample_metric': float(sweep[metric][position]),
+        'returns': strategy_returns[oos_start - is_start - 1:],
+    }
+
+
+def _attach_prices(name, length):
+    """Map the shared price array in a worker process, read-only."""
+    shm = shared_memory.SharedMemory(name=name)
+    prices = np.ndarray((length,), dtype=np.float64, buffer=shm.buf)
+    prices.flags.writeable = False
+    _shared['shm'] = shm
+    _shared['prices'] = prices
+
+
+def _run_shared_fold(bounds, strategy, metric):
+    return run_fold(_shared['prices'], bounds, strategy, metric)
+
+
+def walk_forward(df, strategy, in_sample=IN_SAMPLE_PERIODS, out_of_sample=OUT_OF_SAMPLE_PERIODS,
+                 metric='sharpe_ratio', max_workers=None):
+    """
+    Run a walk-forward optimization of a strategy.
+
+    Parameters:
+    -----------
+    df : pd.DataFrame
+        Processed data for one commodity
+    strategy : str
+        'ma_crossover' or 'rsi'
+    in_sample : int
+        Number of periods each optimization uses
+    out_of_sample : int
+        Number of periods each choice of parameters is traded for
+    metric : str
+        Metric to maximize in sample, a key of SWEEP_METRICS
+    max_workers : int, optional
+        Number of worker processes. Defaults to one per fold, up to the number
+        of CPUs. With 1 the folds run in the calling process.
+
+    Returns:
+    --------
+    dict
+        'folds': DataFrame with one row per fold (dates, parameters, in-sample and
+        out-of-sample metric); 'returns': stitched out-of-sample strategy returns;
+        'equity': out-of-sample equity curve as cumulative returns; 'metrics':
+        out-of-sample performance metrics; 'stability': parameter stability
+    """
+    if strategy not in SWEEPS:
+        raise ValueError(f"Unknown strategy '{strategy}'. Choose from {', '.join(SWEEPS)}.")
+    if metric not in SWEEP_METRICS:
+        raise ValueError(f"Unknown metric '{metric}'. Choose from {', '.join(SWEEP_METRICS)}.")
+
+    prices = np.ascontiguousarray(df[price_column(df)].to_numpy(dtype=np.float64))
+    folds = fold_bounds(len(prices), in_sample, out_of_sample)
+    if not folds:
+        raise ValueError(f"At least {in_sample + 1} periods are needed for a walk-forward optimization")
+
+    if max_workers is None:
+        max_workers = min(len(folds), os.cpu_count() or 1)
+
+    if max_workers <= 1:
+        results = [run_fold(prices, bounds, strategy, metric) for bounds in folds]
+    else:
+        shm = shared_memory.SharedMemory(create=True, size=prices.nbytes)
+        try:
+            np.ndarray(prices.shape, dtype=np.float64, buffer=shm.buf)[:] = prices
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(
+                max_workers=max_workers, mp_context=context,
+                initializer=_attach_prices, initargs=(shm.name, len(prices))
+            ) as executor:
+                results = list(executor.map(
+                    _run_shared_fold, folds, [strategy] * len(folds), [metric] * len(folds)
+                ))
+        finally:
+            shm.close()
+            shm.unlink()
+
+    # Stitch the out-of-sample periods together
+    index = df.index
+    returns = pd.Series(
+        np.concatenate([result['returns'] for result in results]),
+        index=index[folds[0][1]:folds[-1][2]],
+        name='strategy_returns'
+    )
+
+    rows = []
+    for (is_start, oos_start, oos_end), result in zip(folds, results):
+        oos_metric = batch_metrics(result['returns'][None, :])[metric][0]
+        rows.append({
+            'in_sample_start': index[is_start],
+            'out_of_sample_start': index[oos_start],
+            'out_of_sample_end': index[oos_end - 1],
+            **result['params'],
+            f'in_sample_{metric}': result['in_sample_metric'],
+            f'out_of_sample_{metric}': oos_metric,
+        })
+    fold_table = pd.DataFrame(rows)
+    metrics = performance_metrics(returns)
+
+    return {
+        'folds': fold_table,
+        'returns': returns,
+        'equity': (1 + returns).cumprod() - 1,
+        'metrics': metrics,
+        'stability': parameter_stability(fold_table, list(results[0]['params'])),
+    }
+
+
+def parameter_stability(folds, params):
+    """
+    Summarize how much the chosen parameters move between folds.
+
+    Returns:
+    --------
+    pd.DataFrame
+        One row per parameter with its mean, standard deviation, range and the
+        share of re-optimizations that changed it
+    """
+    rows = {}
+    for param in params:
+        values = folds[param].astype(float)
+        rows[param] = {
+            'Mean': values.mean(),
+            'Std': values.std(),
+            'Min': values.min(),
+            'Max': values.max(),
+            'Change Rate': (values.diff().iloc[1:] != 0).mean() if len(values) > 1 else 0.0,
+        }
+    return pd.DataFrame(rows).T
@@ -9,14 +9,12 @@ import sys
 import pandas as pd
 import numpy as np
 import streamlit as st
-import matplotlib.pyplot as plt
-from scipy import stats
 import io
-import base64
 from datetime import datetime
 
-# Import the Q&A component
-from qa_component import qa_interface
+# Import the caches shown in the sidebar; each page imports the modules it uses
+from data_cache import dataframe_cache
+from charting import figure_cache
 
 # Configure page
 st.set_page_config(
@@ -26,278 +24,24 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Create directories if they don't exist
-os.makedirs('data/raw', exist_ok=True)
-os.makedirs('data/processed', exist_ok=True)
-os.makedirs('data/features', exist_ok=True)
-os.makedirs('logs', exist_ok=True)
-os.makedirs('results/trading', exist_ok=True)
-
-def generate_sample_data(commodity, start_date='2020-01-01', end_date='2023-01-01', freq='D'):
-    """Generate sample price data for a commodity."""
-    # Create date range
-    date_rng = pd.date_range(start=start_date, end=end_date, freq=freq)
-    
-    # Set random seed for reproducibility
-    np.random.seed(42 + hash(commodity) % 100)
-    
-    # Generate random walk
-    n = len(date_rng)
-    returns = np.random.normal(0.0005, 0.01, n)
-    
-    # Add some seasonality
-    seasonality = 0.1 * np.sin(np.linspace(0, 4*np.pi, n))
-    
-    # Add trend
-    trend = np.linspace(0, 0.5, n)
-    
-    # Combine components
-    log_prices = np.cumsum(returns) + seasonality + trend
-    
-    # Convert to prices
-    base_price = 50.0 if 'crude' in commodity else 2.0
-    prices = base_price * np.exp(log_prices)
-    
-    # Create DataFrame
-    df = pd.DataFrame({
-        'Date': date_rng,
-        'Price': prices
-    })
-    
-    # Set Date as index
-    df.set_index('Date', inplace=True)
-    
-    # Add volume
-    volume = np.random.lognormal(10, 1, n) * 1000
-    df['Volume'] = volume
-    
-    return df
-
-def clean_data(df):
-    """Clean data by handling missing values and outliers."""
-    # Make a copy of the data
-    df_cleaned = df.copy()
-    
-    # Handle missing values
-    df_cleaned = df_cleaned.fillna(method='ffill').fillna(method='bfill')
-    
-    # Handle outliers using IQR method
-    for col in df_cleaned.select_dtypes(include=['number']).columns:
-        Q1 = df_cleaned[col].quantile(0.25)
-        Q3 = df_cleaned[col].quantile(0.75)
-        IQR = Q3 - Q1
-        
-        lower_bound = Q1 - 1.5 * IQR
-        upper_bound = Q3 + 1.5 * IQR
-        
-        # Replace outliers with bounds
-        df_cleaned.loc[df_cleaned[col] < lower_bound, col] = lower_bound
-        df_cleaned.loc[df_cleaned[col] > upper_bound, col] = upper_bound
-    
-    return df_cleaned
-
-def add_features(df):
-    """Add technical indicators and features to the data."""
-    # Make a copy of the data
-    df_features = df.copy()
-    
-    # Calculate returns
-    df_features['Returns'] = df_features['Price'].pct_change()
-    
-    # Calculate moving averages
-    df_features['MA_10'] = df_features['Price'].rolling(window=10).mean()
-    df_features['MA_30'] = df_features['Price'].rolling(window=30).mean()
-    df_features['MA_50'] = df_features['Price'].rolling(window=50).mean()
-    
-    # Calculate volatility
-    df_features['Volatility'] = df_features['Returns'].rolling(window=20).std() * np.sqrt(252)
-    
-    # Calculate RSI
-    delta = df_features['Price'].diff()
-    gain = delta.copy()
-    loss = delta.copy()
-    gain[gain < 0] = 0
-    loss[loss > 0] = 0
-    loss = abs(loss)
-    
-    avg_gain = gain.rolling(window=14).mean()
-    avg_loss = loss.rolling(window=14).mean()
-    
-    rs = avg_gain / avg_loss
-    df_features['RSI'] = 100 - (100 / (1 + rs))
-    
-    # Calculate Bollinger Bands
-    df_features['BB_Middle'] = df_features['Price'].rolling(window=20).mean()
-    df_features['BB_Upper'] = df_features['BB_Middle'] + 2 * df_features['Price'].rolling(window=20).std()
-    df_features['BB_Lower'] = df_features['BB_Middle'] - 2 * df_features['Price'].rolling(window=20).std()
-    
-    # Calculate MACD
-    df_features['EMA_12'] = df_features['Price'].ewm(span=12, adjust=False).mean()
-    df_features['EMA_26'] = df_features['Price'].ewm(span=26, adjust=False).mean()
-    df_features['MACD'] = df_features['EMA_12'] - df_features['EMA_26']
-    df_features['MACD_Signal'] = df_features['MACD'].ewm(span=9, adjust=False).mean()
-    df_features['MACD_Histogram'] = df_features['MACD'] - df_features['MACD_Signal']
-    
-    return df_features
-
-def process_data(df, commodity):
-    """Process data for a commodity."""
-    # Clean data
-    df_cleaned = clean_data(df)
-    
-    # Add features
-    df_features = add_features(df_cleaned)
-    
-    # Save to processed directory
-    os.makedirs('data/processed', exist_ok=True)
-    df_features.to_csv(f'data/processed/{commodity}.csv')
-    
-    return df_features
+def get_pyplot():
+    """Import matplotlib on first use, as most page views never plot."""
+    import matplotlib.pyplot as plt
+    return plt
 
-def load_data(commodity):
-    """Load processed data for a commodity."""
-    file_path = f'data/processed/{commodity}.csv'
-    
-    if os.path.exists(file_path):
-        df = pd.read_csv(file_path, index_col=0, parse_dates=True)
-        return df
-    
-    return pd.DataFrame()
-
-def download_link(df, filename, text):
-    """Generate a download link for a dataframe."""
-    csv = df.to_csv(index=True)
-    b64 = base64.b64encode(csv.encode()).decode()
-    href = f'<a href="data:file/csv;base64,{b64}" download="{filename}">{text}</a>'
-    return href
-
-def calculate_moving_average_signals(df, fast_window=10, slow_window=30):
-    """Calculate moving average crossover signals."""
-    # Make a copy of the data
-    data = df.copy()
-    
-    # Determine price column
-    price_col = 'Price' if 'Price' in data.columns else 'close'
-    if price_col not in data.columns:
-        # Try to find a suitable price column
-        numeric_cols = data.select_dtypes(include=['number']).columns
-        if len(numeric_cols) > 0:
-            price_col = numeric_cols[0]
-        else:
-            raise ValueError("No suitable price column found in data")
-    
-    # Calculate moving averages
-    data['fast_ma'] = data[price_col].rolling(window=fast_window).mean()
-    data['slow_ma'] = data[price_col].rolling(window=slow_window).mean()
-    
-    # Calculate signals
-    data['signal'] = 0
-    data.loc[data['fast_ma'] > data['slow_ma'], 'signal'] = 1
-    data.loc[data['fast_ma'] < data['slow_ma'], 'signal'] = -1
-    
-    # Calculate position changes
-    data['position_change'] = data['signal'].diff()
-    
-    # Calculate returns
-    data['returns'] = data[price_col].pct_change()
-    
-    # Calculate strategy returns
-    data['strategy_returns'] = data['signal'].shift(1) * data['returns']
-    
-    # Calculate cumulative returns
-    data['cumulative_returns'] = (1 + data['returns']).cumprod() - 1
-    data['strategy_cumulative_returns'] = (1 + data['strategy_returns']).cumprod() - 1
-    
-    return data
-
-def calculate_rsi_signals(df, window=14, oversold=30, overbought=70):
-    """Calculate RSI signals."""
-    # Make a copy of the data
-    data = df.copy()
-    
-    # Determine price column
-    price_col = 'Price' if 'Price' in data.columns else 'close'
-    if price_col not in data.columns:
-        # Try to find a suitable price column
-        numeric_cols = data.select_dtypes(include=['number']).columns
-        if len(numeric_cols) > 0:
-            price_col = numeric_cols[0]
-        else:
-            raise ValueError("No suitable price column found in data")
-    
-    # Calculate price changes
-    delta = data[price_col].diff()
-    
-    # Calculate gains and losses
-    gain = delta.copy()
-    loss = delta.copy()
-    gain[gain < 0] = 0
-    loss[loss > 0] = 0
-    loss = abs(loss)
-    
-    # Calculate average gain and loss
-    avg_gain = gain.rolling(window=window).mean()
-    avg_loss = loss.rolling(window=window).mean()
-    
-    # Calculate RS and RSI
-    rs = avg_gain / avg_loss
-    data['rsi'] = 100 - (100 / (1 + rs))
-    
-    # Calculate signals
-    data['signal'] = 0
-    data.loc[data['rsi'] < oversold, 'signal'] = 1  # Buy when oversold
-    data.loc[data['rsi'] > overbought, 'signal'] = -1  # Sell when overbought
-    
-    # Calculate position changes
-    data['position_change'] = data['signal'].diff()
-    
-    # Calculate returns
-    data['returns'] = data[price_col].pct_change()
-    
-    # Calculate strategy returns
-    data['strategy_returns'] = data['signal'].shift(1) * data['returns']
-    
-    # Calculate cumulative returns
-    data['cumulative_returns'] = (1 + data['returns']).cumprod() - 1
-    data['strategy_cumulative_returns'] = (1 + data['strategy_returns']).cumprod() - 1
-    
-    return data
-
-def calculate_performance_metrics(returns):
-    """Calculate performance metrics."""
-    # Calculate total return
-    total_return = (1 + returns.dropna()).prod() - 1
-    
-    # Calculate annualized return
-    n_periods = len(returns.dropna())
-    n_years = n_periods / 252  # Assuming daily returns
-    annualized_return = (1 + total_return) ** (1 / n_years) - 1 if n_years > 0 else 0
-    
-    # Calculate volatility
-    volatility = returns.std() * np.sqrt(252)
-    
-    # Calculate Sharpe ratio
-    sharpe_ratio = annualized_return / volatility if volatility > 0 else 0
-    
-    # Calculate maximum drawdown
-    cumulative_returns = (1 + returns.dropna()).cumprod() - 1
-    peak = cumulative_returns.cummax()
-    drawdown = (cumulative_returns - peak) / (1 + peak)
-    max_drawdown = drawdown.min()
-    
-    # Calculate win rate
-    win_rate = (returns > 0).mean()
-    
-    metrics = {
-        'Total Return': f"{total_return:.2%}",
-        'Annualized Return': f"{annualized_return:.2%}",
-        'Volatility': f"{volatility:.2%}",
-        'Sharpe Ratio': f"{sharpe_ratio:.2f}",
-        'Max Drawdown': f"{max_drawdown:.2%}",
-        'Win Rate': f"{win_rate:.2%}"
-    }
-    
-    return metrics
+def download_buttons(commodity, key):
+    """Show download buttons for a commodity's processed data, built only when clicked."""
+    from downloads import available_formats, build_download, download_filename, download_mime
+    
+    for fmt in available_formats():
+        st.download_button(
+            f"Download processed {commodity.replace('_', ' ').title()} data ({fmt})",
+            data=lambda fmt=fmt: build_download(commodity, fmt),
+            file_name=download_filename(commodity, fmt),
+            mime=download_mime(fmt),
+            key=f"{key}_{fmt}",
+            on_click='ignore'
+        )
 
 def main():
     """Main function for the web application."""
@@ -317,8 +61,31 @@ def main():
         ["Data Management", "Trading Dashboard", "Risk Analysis", "Q&A"]
     )
     
+    # Memory mode
+    compact_mode = st.sidebar.checkbox(
+        "Compact memory mode",
+        help="Process and backtest prices and indicators as float32 and signals as int8."
+    )
+    
+    # Data cache statistics
+    with st.sidebar.expander("Data Cache"):
+        cache_stats = dataframe_cache.stats()
+        st.write(f"Hits: {cache_stats['hits']} / Misses: {cache_stats['misses']} ({cache_stats['hit_rate']:.0%} hit rate)")
+        st.write(f"Memory: {cache_stats['bytes'] / 1e6:.1f} MB of {cache_stats['max_bytes'] / 1e6:.0f} MB ({cache_stats['entries']} entries)")
+        st.write(f"Disk reads saved: {cache_stats['disk_bytes_saved'] / 1e6:.1f} MB")
+        chart_stats = figure_cache.stats()
+        st.write(f"Charts: {chart_stats['entries']} cached ({chart_stats['bytes'] / 1e6:.1f} MB), {chart_stats['hit_rate']:.0%} hit rate")
+    
     # Data Management page
     if page == "Data Management":
+        # Import the pipeline, ingestion and download modules only when their page is shown
+        from data_pipeline import MemoryReport, generate_sample_data, process_data, append_data
+        from data_storage import list_available_commodities
+        from streaming_ingest import ingest_csv
+        from batch_processing import generate_and_process, run_batch
+        from downloads import available_formats, build_bundle
+        from charting import downsample, render_png
+        
         st.header("Data Management")
         
         # Commodity selection
@@ -347,8 +114,40 @@ def main():
                     key=f"upload_{commodity}"
                 )
                 
+                # Stream large CSV files in chunks
+                stream_upload = (
+                    uploaded_file is not None
+                    and uploaded_file.name.endswith('.csv')
+                    and st.checkbox("Process in chunks (for large CSV files)", key=f"stream_{commodity}")
+                )
+                
+                if stream_upload:
+                    try:
+                        # Only read a preview; the full file is never loaded at once
+                        preview = pd.read_csv(uploaded_file, nrows=5)
+                        
+                        if 'Date' not in preview.columns or 'Price' not in preview.columns:
+                            st.error("The file must have a 'Date' and a 'Price' column.")
+                        else:
+                            st.write("Data preview:")
+                            st.dataframe(preview)
+                            
+                            if st.button(f"Process {commodity.replace('_', ' ').title()} Data", key=f"process_stream_{commodity}"):
+                                progress_text = st.empty()
+                                with st.spinner("Processing data in chunks..."):
+                                    summary = ingest_csv(
+                                        uploaded_file,
+                                        commodity,
+                                        progress=lambda rows: progress_text.write(f"Processed {rows:,} rows"),
+                                        compact=compact_mode
+                                    )
+                                st.success(f"{summary['rows']:,} rows of {commodity.replace('_', ' ').title()} data processed successfully!")
+                    
+                    except Exception as e:
+                        st.error(f"Error processing file: {e}")
+                
                 # Process uploaded file
-                if uploaded_file is not None:
+                elif uploaded_file is not None:
                     try:
                         # Determine file type
                         if uploaded_file.name.endswith('.csv'):
@@ -377,23 +176,27 @@ def main():
                         # Process data
                         if st.button(f"Process {commodity.replace('_', ' ').title()} Data", key=f"process_{commodity}"):
                             with st.spinner("Processing data..."):
-                                df_processed = process_data(df, commodity)
+                                report = MemoryReport()
+                                df_processed = process_data(df, commodity, compact_mode, report)
                                 st.success(f"Data for {commodity.replace('_', ' ').title()} processed successfully!")
                                 
+                                # Display memory footprint
+                                with st.expander("Memory usage by stage"):
+                                    st.dataframe(report.to_frame())
+                                
                                 # Display processed data
                                 st.write("Processed data preview:")
                                 st.dataframe(df_processed.head())
                                 
-                                # Download link
-                                st.markdown(
-                                    download_link(
-                                        df_processed,
-                                        f"{commodity}_processed.csv",
-                                        f"Download processed {commodity.replace('_', ' ').title()} data"
-                                    ),
-                                    unsafe_allow_html=True
-                                )
-                    
+                                # Download buttons
+                                download_buttons(commodity, key=f"download_{commodity}")
+
+                        # Append new rows to existing processed data
+                        if st.button(f"Append New {commodity.replace('_', ' ').title()} Rows", key=f"append_{commodity}"):
+                            with st.spinner("Appending data..."):
+                                df_appended = append_data(df, commodity, compact_mode)
+                                st.success(f"Appended {len(df_appended)} new rows to {commodity.replace('_', ' ').title()} data.")
+
                     except Exception as e:
                         st.error(f"Error processing file: {e}")
                 
@@ -409,65 +212,100 @@ def main():
                         df_sample.to_csv(f'data/raw/{commodity}.csv')
                         
                         # Process data
-                        df_processed = process_data(df_sample, commodity)
+                        report = MemoryReport()
+                        df_processed = process_data(df_sample, commodity, compact_mode, report)
                         
                         st.success(f"Sample data for {commodity.replace('_', ' ').title()} generated and processed successfully!")
                         
+                        # Display memory footprint
+                        with st.expander("Memory usage by stage"):
+                            st.dataframe(report.to_frame())
+                        
                         # Display sample data
                         st.write("Sample data preview:")
                         st.dataframe(df_sample.head())
                         
                         # Plot sample data
+                        plt = get_pyplot()
                         fig, ax = plt.subplots(figsize=(10, 6))
-                        ax.plot(df_sample.index, df_sample['Price'])
+                        price = downsample(df_sample['Price'])
+                        ax.plot(price.index, price)
                         ax.set_title(f"{commodity.replace('_', ' ').title()} Price")
                         ax.set_xlabel("Date")
                         ax.set_ylabel("Price")
                         ax.grid(True)
-                        st.pyplot(fig)
+                        st.image(render_png(fig))
                         
-                        # Download link
-                        st.markdown(
-                            download_link(
-                                df_processed,
-                                f"{commodity}_processed.csv",
-                                f"Download processed {commodity.replace('_', ' ').title()} data"
-                            ),
-                            unsafe_allow_html=True
-                        )
+                        # Download buttons
+                        download_buttons(commodity, key=f"download_sample_{commodity}")
         
         # Generate all sample data
         st.subheader("Generate All Sample Data")
         if st.button("Generate Sample Data for All Commodities"):
             with st.spinner("Generating sample data for all commodities..."):
-                for commodity in commodities:
-                    # Generate sample data
-                    df_sample = generate_sample_data(commodity)
-                    
-                    # Save to raw directory
-                    os.makedirs('data/raw', exist_ok=True)
-                    df_sample.to_csv(f'data/raw/{commodity}.csv')
-                    
-                    # Process data
-                    process_data(df_sample, commodity)
+                progress_bar = st.progress(0.0)
+                status = st.empty()
+                
+                def report_progress(commodity, outcome, n_done, n_total):
+                    progress_bar.progress(n_done / n_total)
+                    status.write(f"Finished {commodity.replace('_', ' ').title()} ({n_done}/{n_total})")
                 
-                st.success("Sample data for all commodities generated and processed successfully!")
+                # One worker process per commodity
+                outcomes = run_batch(
+                    generate_and_process, commodities, progress=report_progress, compact=compact_mode
+                )
+                
+                for commodity, outcome in outcomes.items():
+                    if outcome['status'] == 'ok':
+                        st.write(f"✅ {commodity.replace('_', ' ').title()}: {outcome['result']['rows']} rows")
+                    else:
+                        st.write(f"❌ {commodity.replace('_', ' ').title()}: {outcome['error']}")
+                
+                failed = [c for c, outcome in outcomes.items() if outcome['status'] != 'ok']
+                if failed:
+                    st.error(f"{len(failed)} of {len(commodities)} commodities failed.")
+                else:
+                    st.success("Sample data for all commodities generated and processed successfully!")
+        
+        # Download all processed data as one zip file
+        st.subheader("Download All Processed Data")
+        processed_commodities = list(list_available_commodities(commodities))
+        if processed_commodities:
+            bundle_format = st.radio("Format", available_formats(), horizontal=True, key="bundle_format")
+            st.download_button(
+                "Download All Commodities (zip)",
+                data=lambda: build_bundle(processed_commodities, bundle_format),
+                file_name="processed_data.zip",
+                mime="application/zip",
+                on_click='ignore'
+            )
+        else:
+            st.info("No processed data yet. Upload or generate data above.")
     
     # Trading Dashboard page
     elif page == "Trading Dashboard":
+        # Import the strategies, batch backtests, sweeps and walk-forward engine only when their page is shown
+        from data_pipeline import load_data
+        from data_storage import list_available_commodities
+        from trading_strategies import run_backtest
+        from performance_metrics import (
+            METRIC_FORMATS, PERFORMANCE_METRICS, ROLLING_WINDOW, format_metrics, performance_metrics, rolling_metrics
+        )
+        from batch_backtest import compare_commodities
+        from walk_forward import IN_SAMPLE_PERIODS, OUT_OF_SAMPLE_PERIODS, walk_forward
+        from strategy_sweep import (
+            SWEEP_METRICS, best_parameters, sweep_moving_average, sweep_rsi, sweep_to_frame, sweep_to_series
+        )
+        from charting import chart_key, downsample, render_png
+        
         st.header("Trading Dashboard")
         
         # Available commodities
         commodities = ['crude_oil', 'regular_gasoline', 'conventional_gasoline', 'diesel']
-        available_commodities = []
         
-        # Load data for all commodities
-        data_dict = {}
-        for commodity in commodities:
-            df = load_data(commodity)
-            if not df.empty:
-                data_dict[commodity] = df
-                available_commodities.append(commodity)
+        # Look up available data in the manifest without loading it
+        manifest = list_available_commodities(commodities)
+        available_commodities = list(manifest)
         
         if not available_commodities:
             st.error("No commodity data found. Please go to the Data Management page to generate or upload data.")
@@ -479,6 +317,8 @@ def main():
             available_commodities,
             format_func=lambda x: x.replace('_', ' ').title()
         )
+        entry = manifest[selected_commodity]
+        st.caption(f"{entry['rows']} rows from {entry['start_date']} to {entry['end_date']}")
         
         # Select strategy
         strategy_types = {
@@ -524,109 +364,297 @@ def main():
                 'overbought': overbought
             }
         
+        rolling_window = st.number_input("Rolling Window (days)", 10, 504, ROLLING_WINDOW, step=21)
+        
         # Run backtest button
         if st.button("Run Backtest"):
             with st.spinner("Running backtest..."):
                 try:
-                    # Load data
-                    df = data_dict[selected_commodity]
+                    # Load only the prices; the strategies need nothing else
+                    df = load_data(selected_commodity, columns=['Price'])
                     
-                    # Run strategy
-                    if selected_strategy == 'ma_crossover':
-                        results = calculate_moving_average_signals(
-                            df,
-                            fast_window=strategy_params['fast_window'],
-                            slow_window=strategy_params['slow_window']
-                        )
-                    elif selected_strategy == 'rsi':
-                        results = calculate_rsi_signals(
-                            df,
-                            window=strategy_params['window'],
-                            oversold=strategy_params['oversold'],
-                            overbought=strategy_params['overbought']
-                        )
+                    # Run strategy on arrays and build a DataFrame only for display
+                    backtest = run_backtest(df, selected_strategy, compact_mode, **strategy_params)
+                    results = backtest.to_frame(compact=compact_mode)
                     
                     # Calculate metrics
-                    metrics = calculate_performance_metrics(results['strategy_returns'])
+                    metrics = performance_metrics(backtest.strategy_returns)
+                    st.caption(f"Backtest results use {results.memory_usage(deep=True).sum() / 1e6:.2f} MB")
                     
                     # Display results
                     st.subheader("Backtest Results")
                     
-                    # Metrics
-                    col1, col2, col3 = st.columns(3)
-                    with col1:
-                        st.metric("Total Return", metrics['Total Return'])
-                    with col2:
-                        st.metric("Annualized Return", metrics['Annualized Return'])
-                    with col3:
-                        st.metric("Sharpe Ratio", metrics['Sharpe Ratio'])
-                    
-                    col1, col2, col3 = st.columns(3)
-                    with col1:
-                        st.metric("Volatility", metrics['Volatility'])
-                    with col2:
-                        st.metric("Max Drawdown", metrics['Max Drawdown'])
-                    with col3:
-                        st.metric("Win Rate", metrics['Win Rate'])
+                    # Metrics, formatted only for display
+                    formatted = list(format_metrics(metrics).items())
+                    for row in (formatted[:4], formatted[4:]):
+                        for column, (label, value) in zip(st.columns(4), row):
+                            with column:
+                                st.metric(label, value)
                     
                     # Plot results
                     st.subheader("Performance Chart")
                     
-                    fig, ax = plt.subplots(2, 1, figsize=(10, 8), sharex=True)
-                    
-                    # Plot price and signals
-                    ax[0].plot(results.index, results['Price'], label='Price')
-                    
-                    if selected_strategy == 'ma_crossover':
-                        ax[0].plot(results.index, results['fast_ma'], label=f'{strategy_params["fast_window"]}-day MA')
-                        ax[0].plot(results.index, results['slow_ma'], label=f'{strategy_params["slow_window"]}-day MA')
-                    elif selected_strategy == 'rsi':
-                        ax2 = ax[0].twinx()
-                        ax2.plot(results.index, results['rsi'], label='RSI', color='purple', alpha=0.5)
-                        ax2.axhline(y=strategy_params['oversold'], color='green', linestyle='--')
-                        ax2.axhline(y=strategy_params['overbought'], color='red', linestyle='--')
-                        ax2.set_ylabel('RSI')
-                        ax2.legend(loc='upper right')
-                    
-                    # Plot buy/sell signals
-                    buy_signals = results[results['position_change'] > 0]
-                    sell_signals = results[results['position_change'] < 0]
+                    def draw_performance_chart():
+                        plt = get_pyplot()
+                        fig, ax = plt.subplots(2, 1, figsize=(10, 8), sharex=True)
+                        
+                        # Plot price and signals, downsampled to the chart width but keeping every trade
+                        trades = results['position_change'].fillna(0).to_numpy() != 0
+                        price = downsample(results['Price'], keep=trades)
+                        ax[0].plot(price.index, price, label='Price')
+                        
+                        if selected_strategy == 'ma_crossover':
+                            fast_ma = downsample(results['fast_ma'])
+                            slow_ma = downsample(results['slow_ma'])
+                            ax[0].plot(fast_ma.index, fast_ma, label=f'{strategy_params["fast_window"]}-day MA')
+                            ax[0].plot(slow_ma.index, slow_ma, label=f'{strategy_params["slow_window"]}-day MA')
+                        elif selected_strategy == 'rsi':
+                            rsi = downsample(results['rsi'])
+                            ax2 = ax[0].twinx()
+                            ax2.plot(rsi.index, rsi, label='RSI', color='purple', alpha=0.5)
+                            ax2.axhline(y=strategy_params['oversold'], color='green', linestyle='--')
+                            ax2.axhline(y=strategy_params['overbought'], color='red', linestyle='--')
+                            ax2.set_ylabel('RSI')
+                            ax2.legend(loc='upper right')
+                        
+                        # Plot buy/sell signals
+                        buy_signals = results[results['position_change'] > 0]
+                        sell_signals = results[results['position_change'] < 0]
+                        
+                        ax[0].scatter(buy_signals.index, buy_signals['Price'], marker='^', color='green', label='Buy')
+                        ax[0].scatter(sell_signals.index, sell_signals['Price'], marker='v', color='red', label='Sell')
+                        
+                        ax[0].set_ylabel('Price')
+                        ax[0].legend()
+                        ax[0].grid(True)
+                        
+                        # Plot cumulative returns
+                        cumulative_returns = downsample(results['cumulative_returns'])
+                        strategy_cumulative_returns = downsample(results['strategy_cumulative_returns'])
+                        ax[1].plot(cumulative_returns.index, cumulative_returns, label='Buy & Hold')
+                        ax[1].plot(strategy_cumulative_returns.index, strategy_cumulative_returns, label='Strategy')
+                        ax[1].set_ylabel('Cumulative Returns')
+                        ax[1].legend()
+                        ax[1].grid(True)
+                        
+                        plt.tight_layout()
+                        return fig
                     
-                    ax[0].scatter(buy_signals.index, buy_signals['Price'], marker='^', color='green', label='Buy')
-                    ax[0].scatter(sell_signals.index, sell_signals['Price'], marker='v', color='red', label='Sell')
+                    chart = figure_cache.get_or_render(
+                        chart_key(
+                            entry['content_hash'], 'performance', selected_strategy,
+                            {**strategy_params, 'compact': compact_mode}
+                        ),
+                        draw_performance_chart
+                    )
+                    st.image(chart)
                     
-                    ax[0].set_ylabel('Price')
-                    ax[0].legend()
-                    ax[0].grid(True)
+                    # Rolling metrics show how the strategy behaves across regimes
+                    st.subheader("Rolling Performance")
                     
-                    # Plot cumulative returns
-                    ax[1].plot(results.index, results['cumulative_returns'], label='Buy & Hold')
-                    ax[1].plot(results.index, results['strategy_cumulative_returns'], label='Strategy')
-                    ax[1].set_ylabel('Cumulative Returns')
-                    ax[1].legend()
-                    ax[1].grid(True)
+                    def draw_rolling_chart():
+                        rolling = rolling_metrics(
+                            pd.Series(backtest.strategy_returns, index=backtest.index), int(rolling_window)
+                        )
+                        
+                        plt = get_pyplot()
+                        fig, ax = plt.subplots(4, 1, figsize=(10, 10), sharex=True)
+                        
+                        sharpe = downsample(rolling['sharpe_ratio'])
+                        ax[0].plot(sharpe.index, sharpe)
+                        ax[0].axhline(y=0, color='black', linestyle='--')
+                        ax[0].set_ylabel('Sharpe Ratio')
+                        
+                        volatility = downsample(rolling['volatility'])
+                        ax[1].plot(volatility.index, volatility, color='orange')
+                        ax[1].set_ylabel('Volatility')
+                        
+                        hit_rate = downsample(rolling['hit_rate'])
+                        ax[2].plot(hit_rate.index, hit_rate, color='green')
+                        ax[2].set_ylabel('Hit Rate')
+                        
+                        underwater = downsample(rolling['underwater'])
+                        drawdown = downsample(rolling['drawdown'])
+                        ax[3].fill_between(underwater.index, underwater, 0, color='red', alpha=0.3, label='Underwater')
+                        ax[3].plot(drawdown.index, drawdown, color='darkred', linewidth=0.8, label='Rolling Drawdown')
+                        ax[3].set_ylabel('Drawdown')
+                        ax[3].legend()
+                        
+                        for axis in ax:
+                            axis.grid(True)
+                        ax[0].set_title(f'{int(rolling_window)}-Day Rolling Performance')
+                        plt.tight_layout()
+                        return fig
                     
-                    plt.tight_layout()
-                    st.pyplot(fig)
+                    chart = figure_cache.get_or_render(
+                        chart_key(
+                            entry['content_hash'], 'rolling_performance', selected_strategy,
+                            {**strategy_params, 'compact': compact_mode, 'rolling_window': int(rolling_window)}
+                        ),
+                        draw_rolling_chart
+                    )
+                    st.image(chart)
                     
                 except Exception as e:
                     st.error(f"Error running backtest: {e}")
-    
+
+        # Compare the strategy across commodities
+        st.subheader("Compare Commodities")
+        st.write(f"Backtest the {strategy_types[selected_strategy]} strategy on all available commodities at once.")
+
+        if st.button("Compare All Commodities"):
+            with st.spinner("Backtesting all commodities..."):
+                try:
+                    comparison = compare_commodities(available_commodities, selected_strategy, **strategy_params)
+                    comparison.index = [commodity.replace('_', ' ').title() for commodity in comparison.index]
+
+                    # Format only for display
+                    formats = {PERFORMANCE_METRICS[name]: fmt for name, fmt in METRIC_FORMATS.items()}
+                    formats['Buy & Hold Return'] = '{:.2%}'
+                    st.dataframe(comparison.style.format(formats))
+
+                except Exception as e:
+                    st.error(f"Error comparing commodities: {e}")
+
+        # Parameter sweep
+        st.subheader("Parameter Sweep")
+        st.write("Backtest every parameter combination in the slider ranges at once.")
+
+        if st.button("Run Parameter Sweep"):
+            with st.spinner("Running parameter sweep..."):
+                try:
+                    df = load_data(selected_commodity, columns=['Price'])
+                    heatmap_metrics = ['sharpe_ratio', 'total_return', 'max_drawdown']
+
+                    if selected_strategy == 'ma_crossover':
+                        sweep = sweep_moving_average(df)
+                        best = best_parameters(sweep, 'sharpe_ratio')
+                        st.write(
+                            f"Best Sharpe Ratio with Fast Window {best['fast_windows']} "
+                            f"and Slow Window {best['slow_windows']}"
+                        )
+
+                        # Heatmaps over fast and slow windows
+                        heatmaps = {metric: sweep[metric] for metric in heatmap_metrics}
+                        x_values, y_values = sweep['slow_windows'], sweep['fast_windows']
+                        x_label, y_label = 'Slow Window', 'Fast Window'
+                        table = sweep_to_frame(sweep, 'sharpe_ratio')
+
+                    elif selected_strategy == 'rsi':
+                        sweep = sweep_rsi(df)
+                        best = best_parameters(sweep, 'sharpe_ratio')
+                        st.write(
+                            f"Best Sharpe Ratio with RSI Window {best['windows']}, "
+                            f"Oversold Level {best['oversold_levels']} "
+                            f"and Overbought Level {best['overbought_levels']}"
+                        )
+
+                        # Heatmaps over the thresholds for the selected RSI window
+                        w = list(sweep['windows']).index(strategy_params['window'])
+                        heatmaps = {metric: sweep[metric][w] for metric in heatmap_metrics}
+                        x_values, y_values = sweep['overbought_levels'], sweep['oversold_levels']
+                        x_label, y_label = 'Overbought Level', 'Oversold Level'
+                        table = sweep_to_series(sweep, 'sharpe_ratio').unstack('overbought_levels')
+                        st.write(f"Heatmaps for RSI Window {strategy_params['window']}")
+
+                    # Plot heatmaps
+                    plt = get_pyplot()
+                    fig, ax = plt.subplots(1, len(heatmap_metrics), figsize=(15, 5))
+                    extent = [x_values[0], x_values[-1], y_values[-1], y_values[0]]
+
+                    for i, metric in enumerate(heatmap_metrics):
+                        im = ax[i].imshow(heatmaps[metric], aspect='auto', extent=extent, cmap='RdYlGn')
+                        ax[i].set_title(SWEEP_METRICS[metric])
+                        ax[i].set_xlabel(x_label)
+                        ax[i].set_ylabel(y_label)
+                        fig.colorbar(im, ax=ax[i])
+
+                    plt.tight_layout()
+                    st.image(render_png(fig))
+
+                    # Full Sharpe Ratio table
+                    with st.expander("Sweep results table"):
+                        st.dataframe(table)
+
+                except Exception as e:
+                    st.error(f"Error running parameter sweep: {e}")
+
+        # Walk-forward optimization
+        st.subheader("Walk-Forward Optimization")
+        st.write(
+            "Re-optimize the parameters on a rolling in-sample window and trade them on the "
+            "out-of-sample period that follows, to see how the strategy holds up on unseen data."
+        )
+
+        col1, col2 = st.columns(2)
+        with col1:
+            in_sample = st.number_input("In-Sample Periods", 50, 5000, IN_SAMPLE_PERIODS, step=21)
+        with col2:
+            out_of_sample = st.number_input("Out-of-Sample Periods", 5, 1000, OUT_OF_SAMPLE_PERIODS, step=21)
+
+        if st.button("Run Walk-Forward Optimization"):
+            with st.spinner("Running walk-forward optimization..."):
+                try:
+                    df = load_data(selected_commodity, columns=['Price'])
+                    walk = walk_forward(df, selected_strategy, int(in_sample), int(out_of_sample))
+                    metrics = walk['metrics']
+
+                    # Out-of-sample metrics, formatted only for display
+                    col1, col2, col3 = st.columns(3)
+                    with col1:
+                        st.metric("Out-of-Sample Return", f"{metrics['total_return']:.2%}")
+                    with col2:
+                        st.metric("Out-of-Sample Sharpe Ratio", f"{metrics['sharpe_ratio']:.2f}")
+                    with col3:
+                        st.metric("Out-of-Sample Max Drawdown", f"{metrics['max_drawdown']:.2%}")
+
+                    # Stitched out-of-sample equity curve against buy and hold
+                    prices = df['Price'].loc[walk['equity'].index]
+                    buy_and_hold = downsample(prices / df['Price'].shift(1).loc[prices.index[0]] - 1)
+                    equity = downsample(walk['equity'])
+
+                    plt = get_pyplot()
+                    fig, ax = plt.subplots(figsize=(10, 5))
+                    ax.plot(buy_and_hold.index, buy_and_hold, label='Buy & Hold')
+                    ax.plot(equity.index, equity, label='Walk-Forward Strategy')
+                    for start in walk['folds']['out_of_sample_start']:
+                        ax.axvline(x=start, color='grey', alpha=0.2)
+                    ax.set_ylabel('Cumulative Returns')
+                    ax.legend()
+                    ax.grid(True)
+                    plt.tight_layout()
+                    st.image(render_png(fig))
+
+                    st.write(f"{len(walk['folds'])} folds")
+                    st.dataframe(walk['folds'])
+
+                    # How much the chosen parameters move between folds
+                    st.write("Parameter stability:")
+                    st.dataframe(walk['stability'])
+
+                except Exception as e:
+                    st.error(f"Error running walk-forward optimization: {e}")
+
     # Risk Analysis page
     elif page == "Risk Analysis":
+        # Import the risk and portfolio modules only when their page is shown
+        from data_pipeline import load_data
+        from data_storage import list_available_commodities
+        from risk_analysis import (
+            CONFIDENCE_LEVELS, ROLLING_VAR_WINDOW, SIMULATION_METHODS, confidence_label, return_statistics, rolling_var,
+            simulated_var, value_at_risk
+        )
+        from portfolio_risk import COVARIANCE_METHODS, estimate_covariance, portfolio_var, return_matrix
+        from charting import chart_key, downsample
+        
         st.header("Risk Analysis")
         
         # Available commodities
         commodities = ['crude_oil', 'regular_gasoline', 'conventional_gasoline', 'diesel']
-        available_commodities = []
         
-        # Load data for all commodities
-        data_dict = {}
-        for commodity in commodities:
-            df = load_data(commodity)
-            if not df.empty:
-                data_dict[commodity] = df
-                available_commodities.append(commodity)
+        # Look up available data in the manifest without loading it
+        manifest = list_available_commodities(commodities)
+        available_commodities = list(manifest)
         
         if not available_commodities:
             st.error("No commodity data found. Please go to the Data Management page to generate or upload data.")
@@ -638,9 +666,11 @@ def main():
             available_commodities,
             format_func=lambda x: x.replace('_', ' ').title()
         )
+        entry = manifest[selected_commodity]
+        st.caption(f"{entry['rows']} rows from {entry['start_date']} to {entry['end_date']}")
         
         # Load data
-        df = data_dict[selected_commodity]
+        df = load_data(selected_commodity, columns=['Price'])
         
         # Calculate returns
         returns = df['Price'].pct_change().dropna()
@@ -648,13 +678,7 @@ def main():
         # Display basic statistics
         st.subheader("Return Statistics")
         
-        stats = {
-            'Mean Daily Return': f"{returns.mean():.4%}",
-            'Daily Volatility': f"{returns.std():.4%}",
-            'Annualized Volatility': f"{returns.std() * np.sqrt(252):.4%}",
-            'Minimum Return': f"{returns.min():.4%}",
-            'Maximum Return': f"{returns.max():.4%}"
-        }
+        stats = {name: f"{value:.4%}" for name, value in return_statistics(returns).items()}
         
         col1, col2, col3 = st.columns(3)
         with col1:
@@ -667,38 +691,32 @@ def main():
         # Plot return distribution
         st.subheader("Return Distribution")
         
-        fig, ax = plt.subplots(figsize=(10, 6))
-        ax.hist(returns, bins=50, alpha=0.7)
-        ax.axvline(x=0, color='black', linestyle='--')
-        ax.axvline(x=returns.mean(), color='red', linestyle='-', label=f'Mean: {returns.mean():.4%}')
-        ax.axvline(x=returns.mean() - 2*returns.std(), color='orange', linestyle='--', label=f'2σ Down: {returns.mean() - 2*returns.std():.4%}')
-        ax.axvline(x=returns.mean() + 2*returns.std(), color='green', linestyle='--', label=f'2σ Up: {returns.mean() + 2*returns.std():.4%}')
-        
-        ax.set_xlabel('Daily Return')
-        ax.set_ylabel('Frequency')
-        ax.set_title(f'{selected_commodity.replace("_", " ").title()} Daily Return Distribution')
-        ax.legend()
-        ax.grid(True)
-        
-        st.pyplot(fig)
+        def draw_return_distribution():
+            plt = get_pyplot()
+            fig, ax = plt.subplots(figsize=(10, 6))
+            ax.hist(returns, bins=50, alpha=0.7)
+            ax.axvline(x=0, color='black', linestyle='--')
+            ax.axvline(x=returns.mean(), color='red', linestyle='-', label=f'Mean: {returns.mean():.4%}')
+            ax.axvline(x=returns.mean() - 2*returns.std(), color='orange', linestyle='--', label=f'2σ Down: {returns.mean() - 2*returns.std():.4%}')
+            ax.axvline(x=returns.mean() + 2*returns.std(), color='green', linestyle='--', label=f'2σ Up: {returns.mean() + 2*returns.std():.4%}')
+            
+            ax.set_xlabel('Daily Return')
+            ax.set_ylabel('Frequency')
+            ax.set_title(f'{selected_commodity.replace("_", " ").title()} Daily Return Distribution')
+            ax.legend()
+            ax.grid(True)
+            return fig
+        
+        chart = figure_cache.get_or_render(
+            chart_key(entry['content_hash'], 'return_distribution', params={'commodity': selected_commodity}),
+            draw_return_distribution
+        )
+        st.image(chart)
         
         # Calculate and display Value at Risk
         st.subheader("Value at Risk (VaR)")
         
-        confidence_levels = [0.95, 0.99]
-        var_values = {}
-        
-        for cl in confidence_levels:
-            # Historical VaR
-            var_percentile = 1 - cl
-            historical_var = -np.percentile(returns, var_percentile * 100)
-            
-            # Parametric VaR
-            z_score = stats.norm.ppf(cl)
-            parametric_var = -(returns.mean() + z_score * returns.std())
-            
-            var_values[f'{cl:.0%} Historical VaR'] = f"{historical_var:.4%}"
-            var_values[f'{cl:.0%} Parametric VaR'] = f"{parametric_var:.4%}"
+        var_values = {name: f"{value:.4%}" for name, value in value_at_risk(returns).items()}
         
         col1, col2 = st.columns(2)
         with col1:
@@ -707,10 +725,137 @@ def main():
         with col2:
             st.metric("95% Parametric VaR", var_values['95% Parametric VaR'])
             st.metric("99% Parametric VaR", var_values['99% Parametric VaR'])
+        
+        # Rolling VaR and Expected Shortfall
+        st.subheader("Rolling VaR and Expected Shortfall")
+        
+        var_window = st.number_input("Rolling Window (days)", 20, 1000, ROLLING_VAR_WINDOW, step=10)
+        
+        if len(returns) < var_window:
+            st.info(f"At least {var_window} returns are needed for a rolling window of {var_window} days.")
+        else:
+            def draw_rolling_var():
+                rolling = rolling_var(returns, int(var_window))
+                losses = downsample(-returns)
+                
+                plt = get_pyplot()
+                fig, ax = plt.subplots(figsize=(10, 6))
+                ax.plot(losses.index, losses, color='lightgrey', linewidth=0.8, label='Daily Loss')
+                for column in rolling.columns:
+                    series = downsample(rolling[column])
+                    ax.plot(series.index, series, linestyle='--' if 'Shortfall' in column else '-', label=column)
+                
+                ax.set_ylabel('Loss')
+                ax.set_title(f'{selected_commodity.replace("_", " ").title()} Rolling {int(var_window)}-Day VaR and Expected Shortfall')
+                ax.legend()
+                ax.grid(True)
+                return fig
+            
+            chart = figure_cache.get_or_render(
+                chart_key(entry['content_hash'], 'rolling_var', params={'commodity': selected_commodity, 'window': int(var_window)}),
+                draw_rolling_var
+            )
+            st.image(chart)
+        
+        # Simulated VaR and Expected Shortfall
+        st.subheader("Simulated VaR and Expected Shortfall")
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            simulation_method = st.selectbox(
+                "Simulation Method",
+                list(SIMULATION_METHODS),
+                format_func=lambda x: SIMULATION_METHODS[x]
+            )
+            horizon = st.slider("Horizon (days)", 1, 20, 1)
+        with col2:
+            n_scenarios = st.select_slider("Scenarios", [10_000, 100_000, 1_000_000], 100_000)
+            seed = st.number_input("Random Seed", 0, 2**31 - 1, 42)
+        
+        if st.button("Run Simulation"):
+            with st.spinner("Simulating scenarios..."):
+                simulated = simulated_var(returns, simulation_method, horizon, n_scenarios, seed=int(seed))
+            
+            col1, col2 = st.columns(2)
+            with col1:
+                st.metric("95% VaR", f"{simulated['95% VaR']:.4%}")
+                st.metric("99% VaR", f"{simulated['99% VaR']:.4%}")
+            with col2:
+                st.metric("95% Expected Shortfall", f"{simulated['95% Expected Shortfall']:.4%}")
+                st.metric("99% Expected Shortfall", f"{simulated['99% Expected Shortfall']:.4%}")
+            st.caption(f"{n_scenarios:,} scenarios over {horizon} day(s), seed {int(seed)}")
+    
+        # Portfolio risk
+        st.subheader("Portfolio Risk")
+        
+        if len(available_commodities) < 2:
+            st.info("Generate or upload at least two commodities to analyze a portfolio.")
+        else:
+            portfolio = st.multiselect(
+                "Portfolio Commodities",
+                available_commodities,
+                default=available_commodities,
+                format_func=lambda x: x.replace('_', ' ').title()
+            )
+            
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                covariance_method = st.selectbox(
+                    "Covariance Estimator",
+                    list(COVARIANCE_METHODS),
+                    format_func=lambda x: COVARIANCE_METHODS[x]
+                )
+            with col2:
+                portfolio_confidence = st.selectbox("Confidence Level", CONFIDENCE_LEVELS, format_func=confidence_label)
+            with col3:
+                portfolio_horizon = st.slider("Horizon (days)", 1, 20, 1, key='portfolio_horizon')
+            
+            if len(portfolio) >= 2:
+                st.write("Weights (fraction of capital, negative for short positions):")
+                weight_columns = st.columns(len(portfolio))
+                weights = {}
+                for column, commodity in zip(weight_columns, portfolio):
+                    with column:
+                        weights[commodity] = st.number_input(
+                            commodity.replace('_', ' ').title(), -10.0, 10.0, round(1 / len(portfolio), 4),
+                            step=0.05, key=f'weight_{commodity}'
+                        )
+                
+                try:
+                    portfolio_returns = return_matrix(portfolio)
+                    covariance = estimate_covariance(portfolio_returns, covariance_method)
+                    summary, components = portfolio_var(
+                        covariance, pd.Series(weights), portfolio_confidence, portfolio_horizon
+                    )
+                    
+                    col1, col2, col3 = st.columns(3)
+                    with col1:
+                        st.metric("Portfolio VaR", f"{summary['Portfolio VaR']:.4%}")
+                    with col2:
+                        st.metric("Undiversified VaR", f"{summary['Undiversified VaR']:.4%}")
+                    with col3:
+                        st.metric("Diversification Benefit", f"{summary['Diversification Benefit']:.4%}")
+                    
+                    st.dataframe(components.style.format({
+                        'Weight': '{:.2%}',
+                        'Standalone VaR': '{:.4%}',
+                        'Marginal VaR': '{:.4%}',
+                        'Component VaR': '{:.4%}',
+                        'Contribution': '{:.2%}',
+                    }))
+                    
+                    st.write("Correlation matrix:")
+                    volatility = np.sqrt(np.diag(covariance))
+                    st.dataframe((covariance / np.outer(volatility, volatility)).style.format('{:.2f}'))
+                    st.caption(f"{len(portfolio_returns)} joint daily returns")
+                
+                except Exception as e:
+                    st.error(f"Error calculating portfolio risk: {e}")
     
     # Q&A page
     elif page == "Q&A":
-        # Use the Q&A interface from the imported module
+        # Import the Q&A component only when its page is shown
+        from qa_component import qa_interface
         qa_interface()
 
 if __name__ == "__main__":